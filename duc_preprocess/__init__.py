@@ -1,2 +1,3 @@
 import duc_preprocess.duc2001 as duc2001
 import duc_preprocess.duc2002 as duc2002
+from duc_preprocess.dataset import load_sds
@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import argparse
+import logging
+from .arrays import Vocab
+from .dataset import load_sds, has_arrays
+from .stats import BuildStats, configure_logging, LOG_LEVELS
+
+
+logger = logging.getLogger(__name__)
+
+# Greedy oracle extracts are grown up to the length of the DUC single
+# document abstracts.
+DEFAULT_ORACLE_WORDS = 100
+# Like ROUGE, tokens without a letter or digit are not counted.
+WORD_PATTERN = re.compile(r"[^\W_]")
+
+class Aligner(object):
+    '''
+    Computes, for each input sentence of a document, its unigram and
+    bigram overlap (clipped counts) with each reference summary and its
+    ROUGE-1 and ROUGE-2 recall against them, and greedy oracle extract
+    labels. Tokens are interned as ids and n-grams counted into count
+    matrices, so overlaps are numpy minimums and sums rather than Python
+    loops. Requires numpy.
+    vocab is the token Vocab of the ids the documents hold (see
+    ArrayDataset), or None if they hold strings, which are interned as
+    they are met.
+    '''
+
+    def __init__(self, vocab=None, max_words=DEFAULT_ORACLE_WORDS):
+        try:
+            import numpy
+        except ImportError:
+            raise Exception("Alignment requires numpy.")
+        self.numpy = numpy
+        self.interned = vocab is not None
+        self.vocab = vocab if vocab is not None else Vocab()
+        self.is_word = numpy.zeros(0, dtype=bool)
+        self.max_words = max_words
+
+    def get_ids(self, tokens):
+        '''
+        Return the ids of tokens, without those that are not words.
+        '''
+        numpy = self.numpy
+        if self.interned:
+            ids = numpy.asarray(tokens, dtype=numpy.int64)
+        else:
+            ids = numpy.array([self.vocab.add(token) for token in tokens],
+                              dtype=numpy.int64)
+        if len(self.is_word) < len(self.vocab):
+            new_words = self.vocab.words[len(self.is_word):]
+            self.is_word = numpy.concatenate([self.is_word, numpy.array(
+                [WORD_PATTERN.search(word) is not None
+                 for word in new_words], dtype=bool)])
+        return ids[self.is_word[ids]]
+
+    def count_ngrams(self, sequences, n):
+        '''
+        Return a matrix with a row of n-gram counts per id sequence. The
+        columns are the n-grams occurring in any of the sequences.
+        '''
+        numpy = self.numpy
+        rows = []
+        grams = []
+        for row, ids in enumerate(sequences):
+            if len(ids) < n:
+                continue
+            gram = ids[:len(ids) - n + 1].copy()
+            for i in range(1, n):
+                gram = gram * len(self.vocab) + ids[i:len(ids) - n + 1 + i]
+            grams.append(gram)
+            rows.append(numpy.full(len(gram), row, dtype=numpy.int64))
+        if len(grams) == 0:
+            return numpy.zeros((len(sequences), 0), dtype=numpy.int64)
+        columns, grams = numpy.unique(
+            numpy.concatenate(grams), return_inverse=True)
+        counts = numpy.zeros((len(sequences), len(columns)),
+                             dtype=numpy.int64)
+        numpy.add.at(counts, (numpy.concatenate(rows), grams), 1)
+        return counts
+
+    def get_recall(self, counts, references):
+        '''
+        Return the overlap of each row of counts with each reference and
+        the recall of the references it amounts to.
+        '''
+        numpy = self.numpy
+        overlap = numpy.minimum(
+            counts[:, None, :], references[None, :, :]).sum(axis=2)
+        totals = references.sum(axis=1)
+        recall = overlap / numpy.maximum(totals, 1)[None, :]
+        return overlap, recall
+
+    def get_oracle(self, unigrams, bigrams, unigram_references,
+                   bigram_references, lengths):
+        '''
+        Greedily select the sentences that most increase the mean of the
+        ROUGE-1 and ROUGE-2 recall, averaged over the references, of the
+        sentences selected so far, until no sentence increases it or
+        max_words words are selected. Returns the 0/1 label of each
+        sentence and the score of the selection.
+        '''
+        numpy = self.numpy
+        labels = numpy.zeros(len(lengths), dtype=numpy.int64)
+        if len(lengths) == 0 or len(unigram_references) == 0:
+            return labels, 0.0
+        selected_unigrams = numpy.zeros(unigrams.shape[1], dtype=numpy.int64)
+        selected_bigrams = numpy.zeros(bigrams.shape[1], dtype=numpy.int64)
+        score = 0.0
+        words = 0
+        while words < self.max_words:
+            _, recall_1 = self.get_recall(
+                selected_unigrams[None, :] + unigrams, unigram_references)
+            _, recall_2 = self.get_recall(
+                selected_bigrams[None, :] + bigrams, bigram_references)
+            scores = (recall_1 + recall_2).mean(axis=1) / 2
+            scores[labels == 1] = -1
+            best = int(scores.argmax())
+            if scores[best] <= score:
+                break
+            labels[best] = 1
+            score = float(scores[best])
+            selected_unigrams += unigrams[best]
+            selected_bigrams += bigrams[best]
+            words += lengths[best]
+        return labels, score
+
+    def align(self, sentences, references):
+        '''
+        Align sentences, the token lists or id arrays of a document's
+        sentences, with references, the token lists of the sentences of
+        each reference summary, and return the features as a dict of
+        lists (see align_sds).
+        '''
+        numpy = self.numpy
+        sequences = [self.get_ids(tokens) for tokens in sentences]
+        lengths = [len(ids) for ids in sequences]
+        for reference in references:
+            ids = [self.get_ids(tokens) for tokens in reference]
+            sequences.append(numpy.concatenate(ids) if len(ids) > 0
+                             else numpy.zeros(0, dtype=numpy.int64))
+        unigrams = self.count_ngrams(sequences, 1)
+        bigrams = self.count_ngrams(sequences, 2)
+        n = len(sentences)
+        unigram_overlap, rouge_1 = self.get_recall(
+            unigrams[:n], unigrams[n:])
+        bigram_overlap, rouge_2 = self.get_recall(bigrams[:n], bigrams[n:])
+        labels, score = self.get_oracle(
+            unigrams[:n], bigrams[:n], unigrams[n:], bigrams[n:], lengths)
+        return {"unigram_overlap": unigram_overlap.tolist(),
+                "bigram_overlap": bigram_overlap.tolist(),
+                "rouge_1_recall": rouge_1.tolist(),
+                "rouge_2_recall": rouge_2.tolist(),
+                "oracle_labels": labels.tolist(),
+                "oracle_score": score}
+
+def get_document_tokens(document):
+    '''
+    Return the token lists of the sentences of a document as load_sds
+    returns it and of the sentences of each of its summaries, and the
+    summaries' summarizers.
+    '''
+    if "inputs" in document:
+        sentences, summaries = document["inputs"], document["targets"]
+    else:
+        sentences, summaries = document["sentences"], document["summaries"]
+    references = [[sentence["tokens"] for sentence in summary["sentences"]]
+                  for summary in summaries]
+    summarizers = [summary.get("summarizer") for summary in summaries]
+    return ([sentence["tokens"] for sentence in sentences], references,
+            summarizers)
+
+def align_sds(output_dir, split=None, max_words=DEFAULT_ORACLE_WORDS,
+              stats=None):
+    '''
+    Align the input sentences of the single document data in output_dir
+    (see load_sds for split) with their reference summaries and write
+    the features to alignment.jsonl next to the inputs, one line per
+    document: its "docset_id" and "doc_id", the "summarizers" of its
+    references, per sentence lists of the "unigram_overlap",
+    "bigram_overlap", "rouge_1_recall" and "rouge_2_recall" with each
+    reference, the greedy "oracle_labels" of the sentences and the
+    "oracle_score" of the oracle extract (see Aligner).
+    Returns stats, a BuildStats (new if None) with the time spent aligning.
+    '''
+    if stats is None:
+        stats = BuildStats()
+    if split is not None:
+        output_dir = os.path.join(output_dir, split)
+    # Array data is aligned on its token ids, without decoding them.
+    arrays = has_arrays(output_dir)
+    dataset = load_sds(output_dir, arrays=arrays)
+    vocab = None
+    if arrays:
+        vocab = dataset.vocabs["tokens"]
+    aligner = Aligner(vocab=vocab, max_words=max_words)
+    path = os.path.join(output_dir, "alignment.jsonl")
+    logger.info("Writing %s", path)
+    with stats.timer("align"):
+        with open(path, "w") as fp:
+            for document in dataset:
+                sentences, references, summarizers = get_document_tokens(
+                    document)
+                record = {"docset_id": document["docset_id"],
+                          "doc_id": document["doc_id"],
+                          "summarizers": summarizers}
+                record.update(aligner.align(sentences, references))
+                fp.write(json.dumps(record) + "\n")
+    return stats
+
+def load_alignment(output_dir, split=None):
+    '''
+    Return the features align_sds wrote, keyed by (docset_id, doc_id).
+    '''
+    if split is not None:
+        output_dir = os.path.join(output_dir, split)
+    alignment = {}
+    with open(os.path.join(output_dir, "alignment.jsonl"), "r") as fp:
+        for line in fp:
+            record = json.loads(line)
+            alignment[(record["docset_id"], record["doc_id"])] = record
+    return alignment
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-path", type=str, required=True)
+    parser.add_argument("--split", type=str, default=None)
+    parser.add_argument(
+        "--max-words", type=int, default=DEFAULT_ORACLE_WORDS)
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    stats = align_sds(
+        args.output_path, split=args.split, max_words=args.max_words)
+    logger.info(stats.stop().format())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import re
+from .cache import get_cache_key
+from .tokenizer import tokenize, split_sentences, TOKENIZER_VERSION
+from .spans import make_sentence, shift_sentences
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Annotation profiles and the sentence fields, besides text, they produce.
+PROFILE_FIELDS = {
+    "tokens-only": ["tokens"],
+    "tokens+pos": ["tokens", "pos"],
+    "full": ["tokens", "pos", "ne"],
+}
+ANNOTATION_PROFILES = ["tokens-only", "tokens+pos", "full"]
+DEFAULT_PROFILE = "full"
+
+# Annotator backends and the profiles they support.
+ANNOTATOR_PROFILES = {
+    "spacy": ANNOTATION_PROFILES,
+    "regex": ["tokens-only"],
+}
+ANNOTATORS = ["spacy", "regex"]
+DEFAULT_ANNOTATOR = "spacy"
+
+def check_profile(profile):
+    if profile not in PROFILE_FIELDS:
+        raise Exception("Unknown annotation profile: {}".format(profile))
+
+def check_annotator(annotator, profile=DEFAULT_PROFILE):
+    check_profile(profile)
+    if annotator not in ANNOTATOR_PROFILES:
+        raise Exception("Unknown annotator: {}".format(annotator))
+    if profile not in ANNOTATOR_PROFILES[annotator]:
+        raise Exception(
+            "The {} annotator does not support the {} profile.".format(
+                annotator, profile))
+
+def load_spacy(profile=DEFAULT_PROFILE):
+    '''
+    Load the spacy pipeline for an annotation profile. The "full" profile
+    tags and recognizes entities. The others skip the components they do
+    not need and split sentences with the rule based sentencizer instead
+    of the dependency parser.
+    '''
+    import spacy
+    check_profile(profile)
+    if profile == "full":
+        return spacy.load('en', parser=False)
+    if profile == "tokens+pos":
+        nlp = spacy.load('en', disable=["parser", "ner"])
+    else:
+        nlp = spacy.load('en', disable=["tagger", "parser", "ner"])
+    nlp.add_pipe(nlp.create_pipe("sentencizer"), first=True)
+    return nlp
+
+def get_spacy_model_id(nlp):
+    '''
+    Identify the annotations produced by nlp: the spacy version, model
+    name and version, and the pipeline components that are enabled.
+    '''
+    import spacy
+    meta = getattr(nlp, "meta", {})
+    return "spacy-{} {}_{}-{} {}".format(
+        spacy.__version__, meta.get("lang", ""), meta.get("name", ""),
+        meta.get("version", ""), ",".join(getattr(nlp, "pipe_names", [])))
+
+class SpacyAnnotator(object):
+    '''
+    Annotates paragraphs with a spacy pipeline, nlp if given or else the
+    one load_spacy loads for profile.
+    '''
+
+    def __init__(self, profile=DEFAULT_PROFILE, nlp=None):
+        check_annotator("spacy", profile)
+        if nlp is None:
+            nlp = load_spacy(profile)
+        self.nlp = nlp
+        self.profile = profile
+        self.model_id = "{} {}".format(get_spacy_model_id(nlp), profile)
+
+    def annotate(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        docs = self.nlp.pipe(texts, batch_size=batch_size)
+        return [get_sentences(doc, profile=self.profile) for doc in docs]
+
+    def annotate_spans(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        docs = self.nlp.pipe(texts, batch_size=batch_size)
+        return [get_span_sentences(doc, profile=self.profile)
+                for doc in docs]
+
+class RegexAnnotator(object):
+    '''
+    Splits paragraphs into sentences and tokens with the regular
+    expressions in tokenizer.py. It needs neither spacy nor a model and
+    is much faster, but only supports the tokens-only profile and its
+    sentence and token boundaries differ from spacy's in places.
+    '''
+
+    profile = "tokens-only"
+    model_id = "regex-{} tokens-only".format(TOKENIZER_VERSION)
+
+    def __init__(self, profile="tokens-only"):
+        check_annotator("regex", profile)
+
+    def annotate(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        return [self.get_sentences(text) for text in texts]
+
+    def annotate_spans(self, texts, batch_size=DEFAULT_BATCH_SIZE):
+        return [self.get_span_sentences(text) for text in texts]
+
+    def get_sentences(self, text):
+        sentences = []
+        for spans in split_sentences(text, tokenize(text)):
+            sentences.append(
+                {"tokens": [text[start:end].lower() for start, end in spans],
+                 "text": text[spans[0][0]:spans[-1][1]]})
+        return sentences
+
+    def get_span_sentences(self, text):
+        return [make_sentence(
+                    spans[0][0], spans[-1][1],
+                    [start for start, end in spans],
+                    [end for start, end in spans])
+                for spans in split_sentences(text, tokenize(text))]
+
+def load_annotator(annotator=DEFAULT_ANNOTATOR, profile=DEFAULT_PROFILE):
+    '''
+    Make the annotator backend named annotator (one of ANNOTATORS) for
+    profile.
+    '''
+    check_annotator(annotator, profile)
+    if annotator == "spacy":
+        return SpacyAnnotator(profile)
+    return RegexAnnotator(profile)
+
+def get_annotator(nlp, profile=DEFAULT_PROFILE):
+    '''
+    Return nlp if it is already an annotator, i.e. it has annotate and
+    model_id like SpacyAnnotator, or else wrap the spacy pipeline nlp in
+    a SpacyAnnotator.
+    '''
+    if nlp is None or hasattr(nlp, "annotate"):
+        return nlp
+    return SpacyAnnotator(profile, nlp=nlp)
+
+def normalize_text(text):
+    text = re.sub(r"\r|\t", " ", text)
+    return re.sub(r"\s+", " ", text.strip())
+
+def get_sentences(doc, profile=DEFAULT_PROFILE):
+    fields = PROFILE_FIELDS[profile]
+    ns = []
+    for sent in doc.sents:
+        tokens_all = [w for w in sent
+                      if w.text.strip() != '']
+        tokens = [w.text.strip().lower() for w in tokens_all]
+        pretty_text = sent.text.strip()
+        pretty_text = re.sub(r"\r|\n|\t", r" ", pretty_text)
+        pretty_text = re.sub(r"\s+", r" ", pretty_text)
+        sentence = {"tokens": tokens, "text": pretty_text}
+        if "pos" in fields:
+            sentence["pos"] = [w.pos_ for w in tokens_all]
+        if "ne" in fields:
+            sentence["ne"] = [w.ent_type_ for w in tokens_all]
+        ns.append(sentence)
+    return ns
+
+def get_span_sentences(doc, profile=DEFAULT_PROFILE):
+    '''
+    Like get_sentences, but each sentence holds the offsets of itself and
+    its tokens in the annotated text instead of copies of them (see
+    spans.py). The annotated text is normalized, so the sentence text is
+    just its first token to its last.
+    '''
+    fields = PROFILE_FIELDS[profile]
+    sentences = []
+    for sent in doc.sents:
+        tokens_all = [w for w in sent if not w.is_space]
+        token_starts = [w.idx for w in tokens_all]
+        token_ends = [w.idx + len(w) for w in tokens_all]
+        if len(tokens_all) > 0:
+            start, end = token_starts[0], token_ends[-1]
+        else:
+            start = end = sent.start_char
+        sentence = make_sentence(start, end, token_starts, token_ends)
+        if "pos" in fields:
+            sentence["pos"] = [w.pos_ for w in tokens_all]
+        if "ne" in fields:
+            sentence["ne"] = [w.ent_type_ for w in tokens_all]
+        sentences.append(sentence)
+    return sentences
+
+def annotate_paragraphs(paragraphs, annotator, batch_size=DEFAULT_BATCH_SIZE,
+                        cache=None, spans=False):
+    '''
+    Sentence/word tokenize and tag a list of raw paragraphs with
+    annotator, an object with an annotate(texts, batch_size) method that
+    returns a list of sentence dicts for each text and a model_id string
+    naming its output (see SpacyAnnotator and RegexAnnotator). Returns a
+    list of sentence dicts for each paragraph, in the same order as
+    paragraphs.
+    If cache is an AnnotationCache, paragraphs found in it are not sent to
+    annotator and newly annotated paragraphs are added to it.
+    If spans is True, the sentences are span sentences with offsets into
+    the normalized paragraphs (see spans.py), made by the annotator's
+    annotate_spans method.
+    '''
+    texts = [normalize_text(paragraph) for paragraph in paragraphs]
+    return annotate_texts(
+        texts, annotator, batch_size=batch_size, cache=cache, spans=spans)
+
+def annotate_texts(texts, annotator, batch_size=DEFAULT_BATCH_SIZE,
+                   cache=None, spans=False):
+    '''
+    Like annotate_paragraphs, for paragraphs that are already normalized.
+    '''
+    annotate = annotator.annotate
+    model_id = annotator.model_id
+    if spans:
+        if not hasattr(annotator, "annotate_spans"):
+            raise Exception("The annotator does not support spans.")
+        annotate = annotator.annotate_spans
+        model_id += " spans"
+    if cache is None:
+        return annotate(texts, batch_size=batch_size)
+
+    keys = [get_cache_key(model_id, text) for text in texts]
+    key2sentences = cache.get_many(keys)
+
+    missing_keys = []
+    missing_texts = []
+    for key, text in zip(keys, texts):
+        if key not in key2sentences:
+            key2sentences[key] = None
+            missing_keys.append(key)
+            missing_texts.append(text)
+
+    if len(missing_texts) > 0:
+        annotated = list(zip(missing_keys, annotate(
+            missing_texts, batch_size=batch_size)))
+        cache.put_many(annotated)
+        key2sentences.update(annotated)
+
+    return [key2sentences[key] for key in keys]
+
+def annotate_documents(documents, annotator, batch_size=DEFAULT_BATCH_SIZE,
+                       cache=None, spans=False):
+    '''
+    Annotate a list of document dicts produced by the document readers.
+    The "paragraphs" of all documents are annotated together by
+    annotator (see annotate_paragraphs) and each document's "paragraphs"
+    field is replaced by the list of its "sentences" in paragraph order.
+    If spans is True, the sentences are span sentences and each document
+    also gets a "text", its normalized paragraphs joined by newlines,
+    that they are offsets into (see spans.py).
+    Returns a new list of document dicts.
+    '''
+    provenance = []
+    paragraphs = []
+    for index, document in enumerate(documents):
+        for paragraph in document["paragraphs"]:
+            provenance.append(index)
+            paragraphs.append(paragraph)
+
+    doc_sentences = [[] for document in documents]
+    if not spans:
+        annotated = annotate_paragraphs(
+            paragraphs, annotator, batch_size=batch_size, cache=cache)
+        for index, sentences in zip(provenance, annotated):
+            doc_sentences[index].extend(sentences)
+        return [replace_paragraphs(document, sentences)
+                for document, sentences in zip(documents, doc_sentences)]
+
+    texts = [normalize_text(paragraph) for paragraph in paragraphs]
+    annotated = annotate_texts(
+        texts, annotator, batch_size=batch_size, cache=cache, spans=True)
+    doc_texts = [[] for document in documents]
+    offsets = [0 for document in documents]
+    for index, text, sentences in zip(provenance, texts, annotated):
+        doc_sentences[index].extend(shift_sentences(sentences, offsets[index]))
+        doc_texts[index].append(text)
+        offsets[index] += len(text) + 1
+    return [replace_paragraphs(document, sentences, text="\n".join(texts))
+            for document, sentences, texts in zip(
+                documents, doc_sentences, doc_texts)]
+
+def replace_paragraphs(document, sentences, text=None):
+    # Keep the key order of the document dict so json output is unchanged.
+    replaced = {}
+    for key, value in document.items():
+        if key != "paragraphs":
+            replaced[key] = value
+            continue
+        if text is not None:
+            replaced["text"] = text
+        replaced["sentences"] = sentences
+    return replaced
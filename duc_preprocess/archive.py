@@ -0,0 +1,166 @@
+import io
+import os
+import tarfile
+import zlib
+from .patches import apply_patches, is_removed
+from .stats import BuildStats
+
+
+def decode_text(data):
+    '''
+    Decode file bytes the same way open(path, "r") does, including
+    universal newline translation.
+    '''
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8").read()
+
+def iter_tar_members(tar, expand_nested=True):
+    '''
+    Iterate over (name, bytes) for each regular file in an open tarfile,
+    reading members sequentially so the tarball can be a stream.
+    If expand_nested is True, members ending in ".tar" are read
+    recursively and their files are named as if the inner tar had been
+    extracted into the directory containing it.
+    '''
+    for member in tar:
+        if not member.isfile():
+            continue
+        fp = tar.extractfile(member)
+        if expand_nested and member.name.endswith(".tar"):
+            inner_dir = os.path.dirname(member.name)
+            with tarfile.open(fileobj=fp, mode="r|") as inner_tar:
+                for name, data in iter_tar_members(inner_tar):
+                    yield os.path.join(inner_dir, name), data
+        else:
+            yield member.name, fp.read()
+
+# Fast rather than small: the release text still compresses about 3 to 1.
+FILE_COMPRESSION_LEVEL = 1
+
+def normalize_path(path):
+    path = path.replace(os.sep, "/").strip("/")
+    parts = [part for part in path.split("/") if part not in ("", ".")]
+    return "/".join(parts)
+
+class ArchiveWorkspace(object):
+    '''
+    Read only, in memory view of the files of a NIST release tarball,
+    files being an iterable of (name, bytes) (see iter_tar_members), so
+    the tarball is read in one streaming pass and nothing is written to
+    disk. Each file is kept zlib compressed, which takes about as much
+    memory as the compressed tarball, and is decompressed when it is
+    read.
+    Paths are relative to root, the top level directory of the release
+    inside the tarball, and have the same layout as an extracted copy.
+    patches is an optional dict mapping paths to lists of patches (see
+    patches.apply_patches) that are applied to file contents on read.
+    Reads and repairs are timed in stats (see stats.BuildStats).
+    '''
+
+    def __init__(self, files, root="", patches=None, stats=None):
+        root = normalize_path(root)
+        self.patches = normalize_patches(patches)
+        self.stats = stats if stats is not None else BuildStats()
+        self.files = {}
+        self.dirs = {"": set()}
+        for name, data in files:
+            name = normalize_path(name)
+            if root != "":
+                if not name.startswith(root + "/"):
+                    continue
+                name = name[len(root) + 1:]
+            if is_removed(self.patches.get(name, [])):
+                continue
+            self.files[name] = zlib.compress(data, FILE_COMPRESSION_LEVEL)
+            parts = name.split("/")
+            for i in range(len(parts)):
+                parent = "/".join(parts[:i])
+                self.dirs.setdefault(parent, set()).add(parts[i])
+
+    @staticmethod
+    def from_tarfile(path, root="", patches=None, stats=None):
+        if stats is None:
+            stats = BuildStats()
+        with stats.timer("extract"):
+            with tarfile.open(path, mode="r|*") as tar:
+                return ArchiveWorkspace(
+                    iter_tar_members(tar), root=root, patches=patches,
+                    stats=stats)
+
+    def listdir(self, path):
+        path = normalize_path(path)
+        if path not in self.dirs:
+            raise FileNotFoundError(path)
+        return sorted(self.dirs[path])
+
+    def exists(self, path):
+        path = normalize_path(path)
+        return path in self.files or path in self.dirs
+
+    def read(self, path):
+        path = normalize_path(path)
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        with self.stats.timer("read"):
+            data = zlib.decompress(self.files[path])
+            text = decode_text(data)
+        self.stats.count("bytes_read", len(data))
+        if path in self.patches:
+            with self.stats.timer("repair"):
+                text = apply_patches(self.patches[path], text)
+        return text
+
+class DirectoryWorkspace(object):
+    '''
+    The ArchiveWorkspace interface for a release that has already been
+    extracted to the directory root. Patches are applied on read and the
+    files on disk are left untouched.
+    '''
+
+    def __init__(self, root, patches=None, stats=None):
+        self.root = root
+        self.patches = normalize_patches(patches)
+        self.stats = stats if stats is not None else BuildStats()
+
+    def is_removed(self, path):
+        return is_removed(self.patches.get(normalize_path(path), []))
+
+    def listdir(self, path):
+        return sorted(
+            fn for fn in os.listdir(os.path.join(self.root, path))
+            if not self.is_removed(os.path.join(path, fn)))
+
+    def exists(self, path):
+        return os.path.exists(os.path.join(self.root, path)) \
+            and not self.is_removed(path)
+
+    def read(self, path):
+        if self.is_removed(path):
+            raise FileNotFoundError(path)
+        with self.stats.timer("read"):
+            with open(os.path.join(self.root, path), "r") as fp:
+                text = fp.read()
+        self.stats.count("bytes_read", len(text))
+        patches = self.patches.get(normalize_path(path))
+        if patches is not None:
+            with self.stats.timer("repair"):
+                text = apply_patches(patches, text)
+        return text
+
+def normalize_patches(patches):
+    if patches is None:
+        return {}
+    return {normalize_path(path): path_patches 
+            for path, path_patches in patches.items()}
+
+def get_workspace(release, patches=None, stats=None):
+    '''
+    Return release if it is already a workspace, otherwise treat it as
+    the path to an extracted release directory, applying patches to its
+    files on read. If stats is given, the workspace's reads are timed in
+    it from now on.
+    '''
+    if isinstance(release, str):
+        return DirectoryWorkspace(release, patches=patches, stats=stats)
+    if stats is not None:
+        release.stats = stats
+    return release
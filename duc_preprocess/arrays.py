@@ -0,0 +1,330 @@
+import array
+import json
+import logging
+import os
+import sys
+from .stats import BuildStats
+
+
+FORMAT_VERSION = 1
+TAG_FIELDS = ["tokens", "pos", "ne"]
+STREAMS = ["inputs", "targets"]
+
+logger = logging.getLogger(__name__)
+
+def validate_directory(path):
+    if path != "" and not os.path.exists(path):
+        os.makedirs(path)
+
+class Vocab(object):
+    '''
+    Interns strings as consecutive integer ids in order of first use.
+    '''
+
+    def __init__(self, words=None):
+        self.words = []
+        self.word2id = {}
+        for word in words or []:
+            self.add(word)
+
+    def add(self, word):
+        word_id = self.word2id.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.word2id[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, word_id):
+        return self.words[word_id]
+
+    def save(self, path):
+        with open(path, "w") as fp:
+            for word in self.words:
+                fp.write(json.dumps(word) + "\n")
+
+    @staticmethod
+    def load(path):
+        with open(path, "r") as fp:
+            return Vocab([json.loads(line) for line in fp])
+
+class ArrayStream(object):
+    '''
+    Appends the sentences of one stream ("inputs" or "targets") to flat
+    arrays on disk: a token, pos and ne id per token, the utf-8 text of
+    every sentence, and offset arrays marking where each sentence's
+    tokens and text start and end.
+    '''
+
+    def __init__(self, directory, name, fields=TAG_FIELDS, stats=None):
+        self.fields = fields
+        self.stats = stats if stats is not None else BuildStats()
+        self.fps = {}
+        for field in fields:
+            self.fps[field] = open(os.path.join(
+                directory, "{}.{}.int32".format(name, field)), "wb")
+        self.fps["text"] = open(
+            os.path.join(directory, "{}.text.utf8".format(name)), "wb")
+        self.fps["sentences"] = open(
+            os.path.join(directory, "{}.sentences.int64".format(name)), "wb")
+        self.fps["text_offsets"] = open(os.path.join(
+            directory, "{}.text_offsets.int64".format(name)), "wb")
+        self.num_tokens = 0
+        self.num_bytes = 0
+        self.num_sentences = 0
+        array.array("q", [0]).tofile(self.fps["sentences"])
+        array.array("q", [0]).tofile(self.fps["text_offsets"])
+
+    def write(self, sentences, vocabs):
+        '''
+        Append sentences and return the number of sentences written
+        before them.
+        '''
+        first_sentence = self.num_sentences
+        with self.stats.timer("serialize"):
+            ids = {field: array.array("i") for field in self.fields}
+            token_offsets = array.array("q")
+            text_offsets = array.array("q")
+            text = []
+            for sentence in sentences:
+                for field in self.fields:
+                    ids[field].extend(
+                        vocabs[field].add(tag) for tag in sentence[field])
+                self.num_tokens += len(sentence["tokens"])
+                token_offsets.append(self.num_tokens)
+                data = sentence["text"].encode("utf-8")
+                text.append(data)
+                self.num_bytes += len(data)
+                text_offsets.append(self.num_bytes)
+            text = b"".join(text)
+        arrays = [(self.fps[field], ids[field]) for field in self.fields]
+        arrays.append((self.fps["sentences"], token_offsets))
+        arrays.append((self.fps["text_offsets"], text_offsets))
+        with self.stats.timer("write"):
+            for fp, values in arrays:
+                values.tofile(fp)
+            self.fps["text"].write(text)
+        self.stats.count("bytes_written", len(text) + sum(
+            values.itemsize * len(values) for _, values in arrays))
+        self.num_sentences += len(sentences)
+        return first_sentence
+
+    def close(self):
+        for fp in self.fps.values():
+            fp.close()
+
+class ArrayWriter(object):
+    '''
+    Writes documents in a columnar binary format under output_dir/arrays
+    that can be memory mapped with numpy (see ArrayDataset).
+    Tokens, pos and ne tags are interned in tokens.vocab, pos.vocab and
+    ne.vocab (one JSON string per line, line number is the id) and
+    stored as int32 id arrays, one per stream. Per stream int64 offset
+    arrays give the token span of each sentence, and further offset
+    arrays group input sentences by document and target sentences by
+    summary and summaries by document. Document ids, dates and summary
+    metadata are stored in documents.jsonl, one line per document.
+    fields are the tag fields the annotation profile produced; pos and ne
+    arrays are only written if they are in fields.
+    The arrays are always rewritten from scratch, so writing them is not
+    incremental.
+    '''
+
+    incremental = False
+    concurrent = False
+    schema_version = None
+
+    def __init__(self, output_dir, fields=TAG_FIELDS, stats=None):
+        self.output_dir = output_dir
+        self.fields = fields
+        self.stats = stats if stats is not None else BuildStats()
+        self.directory = os.path.join(output_dir, "arrays")
+        validate_directory(self.directory)
+        self.vocabs = {field: Vocab() for field in fields}
+        self.inputs = ArrayStream(
+            self.directory, "inputs", fields=fields, stats=self.stats)
+        self.targets = ArrayStream(
+            self.directory, "targets", fields=fields, stats=self.stats)
+        self.document_fps = {}
+        for name in ["inputs.documents", "targets.summaries",
+                     "targets.documents"]:
+            self.document_fps[name] = open(os.path.join(
+                self.directory, "{}.int64".format(name)), "wb")
+            array.array("q", [0]).tofile(self.document_fps[name])
+        self.metadata_fp = open(
+            os.path.join(self.directory, "documents.jsonl"), "w")
+        self.num_documents = 0
+        self.num_summaries = 0
+        logger.info("Writing %s", self.directory)
+
+    def write(self, docset_id, doc_id, doc, summaries):
+        self.inputs.write(doc["sentences"], self.vocabs)
+        array.array("q", [self.inputs.num_sentences]).tofile(
+            self.document_fps["inputs.documents"])
+
+        summary_metadata = []
+        for summary in summaries:
+            self.targets.write(summary["sentences"], self.vocabs)
+            array.array("q", [self.targets.num_sentences]).tofile(
+                self.document_fps["targets.summaries"])
+            summary_metadata.append(
+                {key: value for key, value in summary.items()
+                 if key != "sentences"})
+        self.num_summaries += len(summaries)
+        array.array("q", [self.num_summaries]).tofile(
+            self.document_fps["targets.documents"])
+
+        self.metadata_fp.write(json.dumps(
+            {"docset_id": docset_id, "doc_id": doc_id,
+             "date": str(doc["date"]),
+             "summaries": summary_metadata}) + "\n")
+        self.num_documents += 1
+        return {}
+
+    def close(self):
+        with self.stats.timer("write"):
+            self.inputs.close()
+            self.targets.close()
+            for fp in self.document_fps.values():
+                fp.close()
+            self.metadata_fp.close()
+            for field, vocab in self.vocabs.items():
+                vocab.save(os.path.join(
+                    self.directory, "{}.vocab".format(field)))
+            with open(os.path.join(self.directory, "meta.json"), "w") as fp:
+                fp.write(json.dumps(
+                    {"version": FORMAT_VERSION, "byteorder": sys.byteorder,
+                     "fields": self.fields,
+                     "documents": self.num_documents,
+                     "summaries": self.num_summaries,
+                     "input_sentences": self.inputs.num_sentences,
+                     "target_sentences": self.targets.num_sentences}))
+
+class ArrayDataset(object):
+    '''
+    Random access to the documents written by ArrayWriter to
+    output_dir/arrays. Every array is a read only numpy.memmap, and the
+    id arrays returned for a sentence are views into them, so nothing is
+    copied or parsed until it is used. Requires numpy.
+    '''
+
+    def __init__(self, output_dir):
+        try:
+            import numpy
+        except ImportError:
+            raise Exception("ArrayDataset requires numpy.")
+        self.numpy = numpy
+        self.directory = os.path.join(output_dir, "arrays")
+        with open(os.path.join(self.directory, "meta.json"), "r") as fp:
+            self.meta = json.loads(fp.read())
+        if self.meta["version"] != FORMAT_VERSION:
+            raise Exception("Unsupported array format version: {}".format(
+                self.meta["version"]))
+        order = "<" if self.meta["byteorder"] == "little" else ">"
+
+        self.fields = self.meta.get("fields", TAG_FIELDS)
+        self.vocabs = {
+            field: Vocab.load(
+                os.path.join(self.directory, "{}.vocab".format(field)))
+            for field in self.fields}
+        with open(os.path.join(self.directory, "documents.jsonl"),
+                  "r") as fp:
+            self.documents = [json.loads(line) for line in fp]
+        self.positions = {
+            (document["docset_id"], document["doc_id"]): i
+            for i, document in enumerate(self.documents)}
+
+        self.arrays = {}
+        for stream in STREAMS:
+            for field in self.fields:
+                name = "{}.{}".format(stream, field)
+                self.arrays[name] = self.load_array(
+                    name + ".int32", order + "i4")
+            for name in ["sentences", "text_offsets"]:
+                name = "{}.{}".format(stream, name)
+                self.arrays[name] = self.load_array(
+                    name + ".int64", order + "i8")
+            name = "{}.text".format(stream)
+            self.arrays[name] = self.load_array(name + ".utf8", "u1")
+        for name in ["inputs.documents", "targets.summaries",
+                     "targets.documents"]:
+            self.arrays[name] = self.load_array(
+                name + ".int64", order + "i8")
+
+    def load_array(self, filename, dtype):
+        path = os.path.join(self.directory, filename)
+        if os.path.getsize(path) == 0:
+            return self.numpy.zeros(0, dtype=dtype)
+        return self.numpy.memmap(path, dtype=dtype, mode="r")
+
+    def __len__(self):
+        return len(self.documents)
+
+    def get_sentences(self, stream, start, stop):
+        offsets = self.arrays[stream + ".sentences"]
+        text_offsets = self.arrays[stream + ".text_offsets"]
+        text = self.arrays[stream + ".text"]
+        sentences = []
+        for s in range(start, stop):
+            sentence = {}
+            for field in self.fields:
+                sentence[field] = self.arrays[stream + "." + field][
+                    offsets[s]:offsets[s + 1]]
+            sentence["text"] = text[
+                text_offsets[s]:text_offsets[s + 1]].tobytes().decode(
+                    "utf-8")
+            sentences.append(sentence)
+        return sentences
+
+    def get_input_sentences(self, index):
+        '''
+        Return the input sentences of document index as dicts holding
+        "tokens", "pos" and "ne" id arrays (those in self.fields) and the
+        sentence "text".
+        '''
+        offsets = self.arrays["inputs.documents"]
+        return self.get_sentences(
+            "inputs", offsets[index], offsets[index + 1])
+
+    def get_summaries(self, index):
+        '''
+        Return the summaries of document index with their "sentences" in
+        the form of get_input_sentences.
+        '''
+        document_offsets = self.arrays["targets.documents"]
+        summary_offsets = self.arrays["targets.summaries"]
+        summaries = []
+        first = document_offsets[index]
+        for i, metadata in enumerate(self.documents[index]["summaries"]):
+            summary = dict(metadata)
+            summary["sentences"] = self.get_sentences(
+                "targets", summary_offsets[first + i],
+                summary_offsets[first + i + 1])
+            summaries.append(summary)
+        return summaries
+
+    def __getitem__(self, index):
+        '''
+        Return a document by index or by (docset_id, doc_id).
+        '''
+        if isinstance(index, tuple):
+            index = self.positions[index]
+        index = range(len(self))[index]
+        document = dict(self.documents[index])
+        document["sentences"] = self.get_input_sentences(index)
+        document["summaries"] = self.get_summaries(index)
+        return document
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def decode(self, field, ids):
+        '''
+        Map an array of field ("tokens", "pos" or "ne") ids to strings.
+        '''
+        vocab = self.vocabs[field]
+        return [vocab[word_id] for word_id in ids]
@@ -0,0 +1,200 @@
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+from . import duc2001, duc2002
+from .annotation import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, DEFAULT_ANNOTATOR,
+    ANNOTATION_PROFILES, ANNOTATORS)
+from .output import OUTPUT_FORMATS, DEFAULT_WRITER_THREADS
+from .stats import STAGES, configure_logging, LOG_LEVELS
+from .synthetic import (
+    make_releases, DEFAULT_DOCS_PER_DOCSET, DEFAULT_DUC2002_DOCSETS)
+
+
+def get_max_rss():
+    '''
+    Return the peak resident set size in bytes of this process and of
+    its finished child processes (the largest of them), over the whole
+    life of this process.
+    '''
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+def run_child(connection, func, args, kwargs):
+    try:
+        connection.send((func(*args, **kwargs), None))
+    except Exception as e:
+        connection.send((None, "{}: {}".format(type(e).__name__, e)))
+    connection.close()
+
+def run_in_process(func, *args, **kwargs):
+    '''
+    Return func(*args, **kwargs) called in a new process, so that the
+    peak RSS it reads (see get_max_rss) is that of the call alone.
+    '''
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=run_child, args=(sender, func, args, kwargs))
+    process.start()
+    sender.close()
+    try:
+        result, error = receiver.recv()
+    except EOFError:
+        result, error = None, None
+    process.join()
+    if result is None and error is None:
+        error = "exited with code {}".format(process.exitcode)
+    if error is not None:
+        raise Exception("Benchmark process failed: {}".format(error))
+    return result
+
+def run_benchmark(name, preprocess, output_dir, workers=1,
+                  batch_size=DEFAULT_BATCH_SIZE, annotator=DEFAULT_ANNOTATOR,
+                  annotation_profile=DEFAULT_PROFILE, output_format="json",
+                  writer_threads=DEFAULT_WRITER_THREADS):
+    '''
+    Build the single document data of one year into output_dir with
+    preprocess, a preprocess_sds function with its release data paths
+    bound, from scratch and without an annotation cache, and return a
+    dict of its stats (see stats.BuildStats) and throughput. Run it in
+    its own process (see run_in_process) for its peak RSS to be its own.
+    '''
+    stats = preprocess(
+        output_dir, workers=workers, batch_size=batch_size,
+        cache_path=None, incremental=False, output_format=output_format,
+        annotation_profile=annotation_profile, annotator=annotator,
+        writer_threads=writer_threads)
+    max_rss, children_max_rss = get_max_rss()
+    result = stats.to_dict()
+    result.update({
+        "name": name,
+        "docs_per_second": stats.counts["documents"] / stats.elapsed,
+        "tokens_per_second": stats.counts["tokens"] / stats.elapsed,
+        "max_rss": max_rss,
+        "children_max_rss": children_max_rss})
+    return result
+
+def format_result(result):
+    counts = result["counts"]
+    lines = ["{}: {} docs, {} sentences, {} tokens in {:.2f}s".format(
+                 result["name"], counts["documents"], counts["sentences"],
+                 counts["tokens"], result["elapsed"]),
+             "  {:.1f} docs/sec, {:.0f} tokens/sec".format(
+                 result["docs_per_second"], result["tokens_per_second"])]
+    for stage in STAGES:
+        seconds = result["seconds"][stage]
+        lines.append("  {:<10}{:8.2f}s {:5.1f}%".format(
+            stage, seconds, 100 * seconds / result["elapsed"]))
+    lines.append("  peak RSS {:.1f} MB (workers {:.1f} MB)".format(
+        result["max_rss"] / 2 ** 20, result["children_max_rss"] / 2 ** 20))
+    return "\n".join(lines)
+
+def benchmark(release_data_path=None, output_dir=None,
+              docs_per_docset=DEFAULT_DOCS_PER_DOCSET,
+              duc2002_docsets=DEFAULT_DUC2002_DOCSETS, seed=0, workers=1,
+              batch_size=DEFAULT_BATCH_SIZE, annotator=DEFAULT_ANNOTATOR,
+              annotation_profile=DEFAULT_PROFILE, output_format="json",
+              writer_threads=DEFAULT_WRITER_THREADS, report_path=None):
+    '''
+    Benchmark preprocessing the single document data of DUC 2001 and
+    DUC 2002 and return a list of results, one per year (see
+    run_benchmark). Each year is built in a new process, so its peak RSS
+    is not that of the year before.
+    release_data_path is a directory of release tarballs written by
+    synthetic.make_releases. If it is None, a synthetic corpus with
+    docs_per_docset documents per docset and duc2002_docsets DUC 2002
+    docsets is generated in a temporary directory first.
+    Output is written to output_dir, or a temporary directory that is
+    removed afterwards. If report_path is given the results are also
+    written there as JSON.
+    '''
+    temp_dir = tempfile.mkdtemp(prefix="duc_benchmark")
+    try:
+        if release_data_path is None:
+            release_data_path = os.path.join(temp_dir, "release")
+            make_releases(
+                release_data_path, docs_per_docset=docs_per_docset,
+                duc2002_docsets=duc2002_docsets, seed=seed)
+        if output_dir is None:
+            output_dir = os.path.join(temp_dir, "output")
+
+        duc2001_path = os.path.join(
+            release_data_path, "DUC2001_Summarization_Documents.tgz")
+        duc2002_document_path = os.path.join(
+            release_data_path, "DUC2002_Summarization_Documents.tgz")
+        duc2002_summary_path = os.path.join(
+            release_data_path, "DUC2002_test_data.tar.gz")
+        years = [
+            ("duc2001", functools.partial(
+                duc2001.preprocess_sds, nist_data_path=duc2001_path)),
+            ("duc2002", functools.partial(
+                duc2002.preprocess_sds,
+                nist_document_data_path=duc2002_document_path,
+                nist_summary_data_path=duc2002_summary_path))]
+
+        results = []
+        for name, preprocess in years:
+            results.append(run_in_process(
+                run_benchmark, name, preprocess,
+                os.path.join(output_dir, name), workers=workers,
+                batch_size=batch_size, annotator=annotator,
+                annotation_profile=annotation_profile,
+                output_format=output_format,
+                writer_threads=writer_threads))
+    finally:
+        shutil.rmtree(temp_dir)
+
+    for result in results:
+        print(format_result(result))
+    if report_path is not None:
+        with open(report_path, "w") as fp:
+            fp.write(json.dumps(results, indent=2, sort_keys=True))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--release-data", type=str, default=None)
+    parser.add_argument("--output-path", type=str, default=None)
+    parser.add_argument(
+        "--docs-per-docset", type=int, default=DEFAULT_DOCS_PER_DOCSET)
+    parser.add_argument(
+        "--duc2002-docsets", type=int, default=DEFAULT_DUC2002_DOCSETS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--annotator", choices=ANNOTATORS, default=DEFAULT_ANNOTATOR)
+    parser.add_argument(
+        "--annotation-profile", choices=ANNOTATION_PROFILES,
+        default=DEFAULT_PROFILE)
+    parser.add_argument(
+        "--output-format", choices=OUTPUT_FORMATS, default="json")
+    parser.add_argument(
+        "--writer-threads", type=int, default=DEFAULT_WRITER_THREADS)
+    parser.add_argument("--report", type=str, default=None)
+    parser.add_argument(
+        "--log-level", choices=LOG_LEVELS, default="WARNING")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    benchmark(
+        release_data_path=args.release_data, output_dir=args.output_path,
+        docs_per_docset=args.docs_per_docset,
+        duc2002_docsets=args.duc2002_docsets, seed=args.seed,
+        workers=args.workers, batch_size=args.batch_size,
+        annotator=args.annotator,
+        annotation_profile=args.annotation_profile,
+        output_format=args.output_format,
+        writer_threads=args.writer_threads, report_path=args.report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,542 @@
+import os
+import functools
+import logging
+from . import document_parser
+from .annotation import (
+    annotate_documents, load_annotator, get_annotator, check_annotator,
+    DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, DEFAULT_ANNOTATOR, PROFILE_FIELDS,
+    ANNOTATION_PROFILES, ANNOTATORS)
+from .cache import (
+    DEFAULT_MAX_SIZE, DEFAULT_CACHE_PATH, CACHE_HELP, format_stats)
+from .manifest import BuildManifest, hash_text
+from .output import (
+    AsyncWriter, MdsJsonWriter, make_writer, check_writer_threads,
+    DEFAULT_SHARD_SIZE, DEFAULT_WRITER_THREADS, OUTPUT_FORMATS, LINE_TYPES)
+from .schema import LEGACY_SCHEMA_VERSION, SPAN_SCHEMA_VERSION, SCHEMA_VERSIONS
+from .spans import expand_sentences
+from .sentences import compact_document
+from .stats import BuildStats, configure_logging, LOG_LEVELS
+from .vocab import VocabCounts
+from .workers import DocsetPool
+from .alignment import align_sds
+
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_docset(docset_id, summary_files, input_files, parser,
+                   manifest=None, stats=None, shared=None):
+    '''
+    Read the summaries and input documents of a docset without annotating
+    them and work out which documents need to be (re)built.
+    summary_files is a list of (path, xml, unique) perdocs files; the
+    summaries of a document are kept in file order, and unique means a
+    file may not summarize a document that already has a summary.
+    input_files is a list of (path, xml) document files.
+    Returns a list of (doc_id, document, summaries, input_hashes) for the
+    documents with summaries that are not complete in manifest.
+    If shared, a dedup.SharedDocuments, holds the annotated document of
+    an input file, it is used as is instead of parsing the file, and the
+    other stale documents are noted in it to be kept once annotated.
+    Parsing is timed in stats.
+    '''
+    if stats is None:
+        stats = BuildStats()
+    id2summaries = {}
+    summary_hashes = {}
+    for path, xml, unique in summary_files:
+        summary_hashes[path] = hash_text(xml)
+        with stats.timer("parse"):
+            summaries = parser.read_perdocs_xml(path, xml)
+        for doc_id, summary in summaries.items():
+            if unique:
+                assert doc_id not in id2summaries
+            summary["docset_id"] = docset_id
+            id2summaries.setdefault(doc_id, []).append(summary)
+    logger.debug("Found %d summarized docs for docset %s",
+                 len(id2summaries), docset_id)
+
+    docs = {}
+    doc_hashes = {}
+    for path, xml in input_files:
+        file_hash = hash_text(xml)
+        doc = None
+        if shared is not None:
+            doc = shared.get(docset_id, path, file_hash)
+        if doc is None:
+            with stats.timer("parse"):
+                doc = parser.read_input_docs([(path, xml)])[0]
+        docs[doc["doc_id"]] = doc
+        doc_hashes[doc["doc_id"]] = {path: file_hash}
+
+    stale = []
+    for doc_id, summaries in id2summaries.items():
+        assert doc_id in docs
+        input_hashes = dict(doc_hashes[doc_id])
+        input_hashes.update(summary_hashes)
+        if manifest is not None and manifest.is_complete(
+                docset_id, doc_id, input_hashes):
+            logger.debug("Skipping up to date doc %s %s", docset_id, doc_id)
+            stats.count("skipped_documents")
+            continue
+        if shared is not None and "paragraphs" in docs[doc_id]:
+            for path, file_hash in doc_hashes[doc_id].items():
+                shared.expect(
+                    docset_id, doc_id, path, file_hash,
+                    docs[doc_id]["paragraphs"])
+        stale.append((doc_id, docs[doc_id], summaries, input_hashes))
+    return stale
+
+def prepare_docsets(docsets, parser, manifest=None, stats=None,
+                    shared=None):
+    '''
+    Lazily prepare each docset in docsets (see prepare_docset), yielding
+    (docset_id, stale) for the docsets with documents to build.
+    '''
+    for docset_id, summary_files, input_files in docsets:
+        stale = prepare_docset(
+            docset_id, summary_files, input_files, parser,
+            manifest=manifest, stats=stats, shared=shared)
+        if len(stale) > 0:
+            yield docset_id, stale
+
+def annotate_docset(docset_id, stale, annotator,
+                    batch_size=DEFAULT_BATCH_SIZE, cache=None,
+                    vocab_fields=None, spans=False):
+    '''
+    Annotate the documents and summaries of a prepared docset together
+    and return (docset_id, stale, stats, vocab) with the annotated
+    documents, a BuildStats of the annotation and, if vocab_fields is
+    given, the VocabCounts of those fields of the docset (else None).
+    Documents that are already annotated (see dedup.SharedDocuments) are
+    passed through and not counted in the stats.
+    If spans is True, the sentences are span sentences (see spans.py),
+    otherwise they are returned in SentenceBlocks (see sentences.py),
+    which keep them in much less memory until they are written.
+    '''
+    stats = BuildStats()
+    documents = []
+    for doc_id, doc, summaries, input_hashes in stale:
+        if "paragraphs" in doc:
+            documents.append(doc)
+        documents.extend(summaries)
+    with stats.timer("annotate"):
+        annotated = annotate_documents(
+            documents, annotator, batch_size=batch_size, cache=cache,
+            spans=spans)
+    for document, annotated_document in zip(documents, annotated):
+        stats.count("paragraphs", len(document["paragraphs"]))
+        stats.count_sentences(annotated_document["sentences"])
+    annotated = iter(annotated)
+
+    annotated_stale = []
+    for doc_id, doc, summaries, input_hashes in stale:
+        if "paragraphs" in doc:
+            doc = next(annotated)
+        summaries = [next(annotated) for summary in summaries]
+        annotated_stale.append((doc_id, doc, summaries, input_hashes))
+
+    vocab = None
+    if vocab_fields is not None:
+        vocab = VocabCounts(vocab_fields)
+        for _, doc, summaries, _ in annotated_stale:
+            vocab.add("inputs", get_sentences(doc))
+            for summary in summaries:
+                vocab.add("targets", get_sentences(summary))
+
+    compacted_stale = [
+        (doc_id, compact_document(doc),
+         [compact_document(summary) for summary in summaries], input_hashes)
+        for doc_id, doc, summaries, input_hashes in annotated_stale]
+    return docset_id, compacted_stale, stats, vocab
+
+def get_sentences(document):
+    '''
+    Return the sentences of an annotated document with their text and
+    tokens, slicing them out of its text if they are span sentences.
+    '''
+    if "text" in document:
+        return expand_sentences(document["text"], document["sentences"])
+    return document["sentences"]
+
+def close_writer(writer, manifest=None, error=False):
+    '''
+    Close writer, an output.AsyncWriter, and then manifest if it is given,
+    even if closing writer fails. If error is True, the build is already
+    failing, so an error closing writer is logged instead of being raised
+    in place of the build's.
+    '''
+    try:
+        writer.close()
+    except Exception:
+        if not error:
+            raise
+        logger.exception("Failed to close the writer")
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+def build_docsets(docsets, parser, pool, writer, incremental=True,
+                  batch_size=DEFAULT_BATCH_SIZE, profile=DEFAULT_PROFILE,
+                  annotator=DEFAULT_ANNOTATOR, stats=None, vocab=None,
+                  shared=None, writer_threads=DEFAULT_WRITER_THREADS):
+    '''
+    Parse, annotate and write the single document data for docsets, an
+    iterable of (docset_id, summary_files, input_files) (see
+    prepare_docset), with writer (see output.make_writer).
+    docsets is consumed lazily and each docset is written before more
+    than a few docsets ahead of it are read, so the documents held in
+    memory are bounded by the largest docsets in flight. docsets should
+    be a generator that reads each docset's files when it is reached,
+    e.g. from an archive.ArchiveWorkspace. What still grows with the
+    corpus is the workspace, which holds the release files compressed,
+    and a manifest entry per document.
+    All paragraphs of a docset's documents and summaries are annotated
+    together as one job on pool, whose annotator is the annotator backend
+    named annotator for profile.
+    If the writer supports it, each written document is recorded in
+    the manifest.jsonl of the writer's output_dir, and if incremental is
+    True, documents already built from the same release files by the
+    same parser version, output schema, annotator and annotation profile
+    are skipped. The annotator's model_id (see DocsetPool.get_model_id)
+    is part of the manifest version, so like the annotation cache, the
+    manifest is invalidated when the model or its version changes.
+    If vocab, a VocabCounts, is given, the vocabulary of every document
+    built is counted in the workers and merged into it. Since skipped
+    documents would be missing from the counts, the build is then not
+    incremental.
+    If shared, a dedup.SharedDocuments, is given, documents it holds are
+    reused rather than parsed and annotated, and the documents built are
+    added to it, so that builds of releases with documents in common can
+    share them. It must only be shared by builds with the same annotator
+    and profile.
+    If the writer writes the span schema (see schema.SPAN_SCHEMA_VERSION),
+    documents are annotated as span sentences.
+    Documents are written, and recorded in the manifest, by
+    writer_threads background threads (see output.AsyncWriter), or as
+    they are built if writer_threads is 0.
+    Returns stats, a BuildStats (new if None) to which the parse and
+    annotate times and document counts of the build are added.
+    '''
+    if stats is None:
+        stats = BuildStats()
+    vocab_fields = None
+    if vocab is not None:
+        vocab_fields = vocab.fields
+        incremental = False
+    manifest = None
+    if writer.incremental:
+        manifest = BuildManifest(
+            writer.output_dir,
+            "{} schema-{} annotator-{} profile-{} model-{}".format(
+                parser.PARSER_VERSION, writer.schema_version, annotator,
+                profile, pool.get_model_id()))
+    spans = writer.schema_version == SPAN_SCHEMA_VERSION
+
+    writer = AsyncWriter(writer, threads=writer_threads, stats=stats)
+    try:
+        jobs = prepare_docsets(
+            docsets, parser, manifest=manifest if incremental else None,
+            stats=stats, shared=shared)
+        for docset_id, annotated_stale, annotate_stats, docset_vocab in \
+                pool.imap(annotate_docset, jobs, batch_size=batch_size,
+                          vocab_fields=vocab_fields, spans=spans):
+            stats.merge(annotate_stats)
+            if vocab is not None:
+                vocab.merge(docset_vocab)
+            for doc_id, doc, summaries, input_hashes in annotated_stale:
+                stats.count("documents")
+                stats.count("summaries", len(summaries))
+                if shared is not None:
+                    shared.add(docset_id, doc_id, doc)
+                done = None
+                if manifest is not None:
+                    done = functools.partial(
+                        manifest.add, docset_id, doc_id, input_hashes)
+                writer.write((docset_id, doc_id, doc, summaries), done=done)
+    except BaseException:
+        close_writer(writer, manifest=manifest, error=True)
+        raise
+    close_writer(writer, manifest=manifest)
+    return stats
+
+def prepare_mds_docsets(docsets, parser, stats=None):
+    '''
+    Lazily read the input documents and multi document summaries of each
+    docset in docsets, an iterable of (docset_id, summary_files,
+    input_files) where summary_files is a list of (path, xml) summary
+    files, yielding (docset_id, documents, summaries) without annotating
+    them. Parsing is timed in stats.
+    '''
+    if stats is None:
+        stats = BuildStats()
+    for docset_id, summary_files, input_files in docsets:
+        with stats.timer("parse"):
+            documents = parser.read_input_docs(input_files)
+            summaries = [parser.read_mds_xml(path, xml)
+                         for path, xml in summary_files]
+        for summary in summaries:
+            summary["docset_id"] = docset_id
+        yield docset_id, documents, summaries
+
+def annotate_mds_docset(docset_id, documents, summaries, annotator,
+                        batch_size=DEFAULT_BATCH_SIZE, cache=None):
+    '''
+    Annotate the documents of a docset and its summaries of every size
+    together, each document once however many summaries refer to it, and
+    return (docset_id, documents, summaries, stats) with the annotated
+    documents and summaries and a BuildStats of the annotation.
+    '''
+    stats = BuildStats()
+    with stats.timer("annotate"):
+        annotated = annotate_documents(
+            documents + summaries, annotator, batch_size=batch_size,
+            cache=cache)
+    for document, annotated_document in zip(
+            documents + summaries, annotated):
+        stats.count("paragraphs", len(document["paragraphs"]))
+        stats.count_sentences(annotated_document["sentences"])
+    return (docset_id, annotated[:len(documents)],
+            annotated[len(documents):], stats)
+
+def build_mds_docsets(docsets, parser, pool, writer,
+                      batch_size=DEFAULT_BATCH_SIZE, stats=None,
+                      writer_threads=DEFAULT_WRITER_THREADS):
+    '''
+    Parse, annotate and write the multi document data for docsets (see
+    prepare_mds_docsets) with writer (see output.MdsJsonWriter). Like
+    build_docsets, docsets are read lazily and annotated as one job each
+    on pool and written by writer_threads background threads, but every
+    docset is rebuilt.
+    Returns stats, a BuildStats (new if None) to which the parse and
+    annotate times and document counts of the build are added.
+    '''
+    if stats is None:
+        stats = BuildStats()
+    writer = AsyncWriter(writer, threads=writer_threads, stats=stats)
+    try:
+        jobs = prepare_mds_docsets(docsets, parser, stats=stats)
+        for docset_id, documents, summaries, annotate_stats in pool.imap(
+                annotate_mds_docset, jobs, batch_size=batch_size):
+            stats.merge(annotate_stats)
+            stats.count("documents", len(documents))
+            stats.count("summaries", len(summaries))
+            writer.write((docset_id, documents, summaries))
+    except BaseException:
+        close_writer(writer, error=True)
+        raise
+    close_writer(writer)
+    return stats
+
+def get_split_dir(output_dir, split):
+    if split is None:
+        return output_dir
+    return os.path.join(output_dir, split)
+
+def open_pool(nlp=None, workers=1, cache_path=DEFAULT_CACHE_PATH,
+              cache_max_size=DEFAULT_MAX_SIZE,
+              annotation_profile=DEFAULT_PROFILE,
+              annotator=DEFAULT_ANNOTATOR, stats=None):
+    load = functools.partial(
+        load_annotator, annotator=annotator, profile=annotation_profile)
+    return DocsetPool(workers=workers,
+                      annotator=get_annotator(nlp, annotation_profile),
+                      load_annotator=load, cache_path=cache_path,
+                      cache_max_size=cache_max_size, stats=stats)
+
+def build_sds(open_splits, output_dir, nlp=None,
+              batch_size=DEFAULT_BATCH_SIZE, workers=1,
+              cache_path=DEFAULT_CACHE_PATH, cache_max_size=DEFAULT_MAX_SIZE,
+              incremental=True, output_format="json",
+              shard_size=DEFAULT_SHARD_SIZE, compression=None,
+              lines="document", schema_version=LEGACY_SCHEMA_VERSION,
+              annotation_profile=DEFAULT_PROFILE,
+              annotator=DEFAULT_ANNOTATOR, stats=None, vocab=False,
+              align=False, shared=None,
+              writer_threads=DEFAULT_WRITER_THREADS):
+    '''
+    Write the single document data of a release to output_dir.
+    open_splits is called with stats once the arguments are checked, to
+    open the release, and returns an iterable of (split, docsets): the
+    subdirectory of output_dir each split is written to, or None for
+    output_dir itself, and its docsets (see build_docsets).
+    Paragraphs are annotated by the annotator backend named annotator
+    ("spacy" or "regex", see annotation.load_annotator) or, if given, by
+    nlp, a spacy pipeline or an object like annotation.SpacyAnnotator.
+    If workers > 1, docsets are parsed and annotated in that many worker
+    processes, each loading its own annotator (nlp is then unused).
+    The output is the same as a single process run.
+    Paragraph annotations are read from and added to the AnnotationCache
+    at cache_path, by default cache.DEFAULT_CACHE_PATH, unless it is
+    None; it is trimmed to cache_max_size bytes.
+    If incremental is True, documents whose release files, parser version
+    and outputs are unchanged since the last build (see BuildManifest) are
+    not rebuilt.
+    output_format is "json" for a pair of JSON files per document or
+    "jsonl" for sharded JSON Lines files with shard_size documents per
+    shard, compressed with compression (None, "gzip" or "zstd"), and one
+    line per "document" or "sentence" (see output.ShardedJsonlWriter).
+    output_format "array" writes numpy memory mappable arrays of
+    interned ids instead (see arrays.ArrayWriter and arrays.ArrayDataset).
+    schema_version selects the JSON output schema; version 2 stores
+    document level fields once per document, and version 3 also stores
+    each document's text once, with sentence and token offsets into it
+    instead of copies of their text (see schema.py and spans.py).
+    annotation_profile is "full", "tokens+pos" or "tokens-only" (see
+    annotation.load_spacy); fields a profile does not produce are left
+    out of the output. The regex annotator only supports "tokens-only".
+    If vocab is True, the frequencies of the tokens and tags of each split
+    are counted as it is built and written to its vocab subdirectory (see
+    vocab.VocabCounts); the build is then not incremental.
+    If align is True, each split's input sentences are then aligned with
+    their summaries (see alignment.align_sds), which requires numpy.
+    shared is an optional dedup.SharedDocuments of annotated documents to
+    reuse and add to (see build_docsets).
+    Output is serialized and written by writer_threads background
+    threads while the next docsets are annotated (see output.AsyncWriter);
+    only the json output format can have more than one.
+    Returns stats, a BuildStats (new if None) of the time spent in each
+    stage of the build and the number of documents, sentences, tokens
+    and bytes processed.
+    '''
+    check_annotator(annotator, annotation_profile)
+    check_writer_threads(writer_threads, output_format)
+    if stats is None:
+        stats = BuildStats()
+    splits = open_splits(stats)
+    fields = PROFILE_FIELDS[annotation_profile]
+    with open_pool(nlp=nlp, workers=workers, cache_path=cache_path,
+                   cache_max_size=cache_max_size,
+                   annotation_profile=annotation_profile,
+                   annotator=annotator, stats=stats) as pool:
+        for split, docsets in splits:
+            split_dir = get_split_dir(output_dir, split)
+            writer = make_writer(
+                split_dir, output_format=output_format,
+                shard_size=shard_size, compression=compression, lines=lines,
+                schema_version=schema_version, fields=fields, stats=stats)
+            split_vocab = None
+            if vocab:
+                split_vocab = VocabCounts(fields)
+            build_docsets(
+                docsets, document_parser, pool, writer,
+                incremental=incremental, batch_size=batch_size,
+                profile=annotation_profile, annotator=annotator,
+                stats=stats, vocab=split_vocab, shared=shared,
+                writer_threads=writer_threads)
+            if split_vocab is not None:
+                split_vocab.save(os.path.join(split_dir, "vocab"))
+            if align:
+                align_sds(split_dir, stats=stats)
+        if pool.cache is not None:
+            logger.info(format_stats(pool.cache.stats()))
+    stats.stop()
+    logger.info(stats.format())
+    return stats
+
+def build_mds(open_splits, output_dir, nlp=None,
+              batch_size=DEFAULT_BATCH_SIZE, workers=1,
+              cache_path=DEFAULT_CACHE_PATH, cache_max_size=DEFAULT_MAX_SIZE,
+              annotation_profile=DEFAULT_PROFILE,
+              annotator=DEFAULT_ANNOTATOR, stats=None,
+              writer_threads=DEFAULT_WRITER_THREADS):
+    '''
+    Write the multi document data of a release to output_dir (see
+    output.MdsJsonWriter). open_splits is as for build_sds, with docsets
+    as for build_mds_docsets, and the other arguments are as for
+    build_sds. Each document is annotated once for all the summaries
+    that refer to it, and with the same cache_path as the single
+    document build (the default) none is annotated again.
+    Returns stats, a BuildStats (new if None) of the build.
+    '''
+    check_annotator(annotator, annotation_profile)
+    check_writer_threads(writer_threads)
+    if stats is None:
+        stats = BuildStats()
+    splits = open_splits(stats)
+    with open_pool(nlp=nlp, workers=workers, cache_path=cache_path,
+                   cache_max_size=cache_max_size,
+                   annotation_profile=annotation_profile,
+                   annotator=annotator, stats=stats) as pool:
+        for split, docsets in splits:
+            writer = MdsJsonWriter(
+                get_split_dir(output_dir, split), stats=stats)
+            build_mds_docsets(
+                docsets, document_parser, pool, writer,
+                batch_size=batch_size, stats=stats,
+                writer_threads=writer_threads)
+        if pool.cache is not None:
+            logger.info(format_stats(pool.cache.stats()))
+    stats.stop()
+    logger.info(stats.format())
+    return stats
+
+def add_build_arguments(parser, sds=True):
+    '''
+    Add the command line options of build_sds, or of build_mds if sds is
+    False, and --report and --log-level to parser.
+    '''
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--cache-path", type=str, default=DEFAULT_CACHE_PATH,
+        help=CACHE_HELP)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument(
+        "--cache-max-size", type=int, default=DEFAULT_MAX_SIZE)
+    if sds:
+        parser.add_argument("--rebuild", action="store_true")
+        parser.add_argument(
+            "--output-format", choices=OUTPUT_FORMATS, default="json")
+        parser.add_argument(
+            "--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+        parser.add_argument(
+            "--compression", choices=["gzip", "zstd"], default=None)
+        parser.add_argument(
+            "--lines", choices=LINE_TYPES, default="document")
+        parser.add_argument(
+            "--schema-version", type=int, choices=SCHEMA_VERSIONS,
+            default=LEGACY_SCHEMA_VERSION)
+    parser.add_argument(
+        "--annotation-profile", choices=ANNOTATION_PROFILES,
+        default=DEFAULT_PROFILE)
+    parser.add_argument(
+        "--annotator", choices=ANNOTATORS, default=DEFAULT_ANNOTATOR)
+    if sds:
+        parser.add_argument("--vocab", action="store_true")
+        parser.add_argument("--align", action="store_true")
+    parser.add_argument(
+        "--writer-threads", type=int, default=DEFAULT_WRITER_THREADS)
+    parser.add_argument("--report", type=str, default=None)
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO")
+
+def parse_build_arguments(parser, sds=True):
+    '''
+    Parse the command line with parser, to which add_build_arguments
+    added its options, and configure logging. Exits with a usage error if
+    the writer threads do not suit the output format.
+    Returns the parsed arguments and the keyword arguments they give
+    build_sds, or build_mds if sds is False.
+    '''
+    args = parser.parse_args()
+    output_format = args.output_format if sds else "json"
+    try:
+        check_writer_threads(args.writer_threads, output_format)
+    except ValueError as e:
+        parser.error(str(e))
+    configure_logging(args.log_level)
+
+    kwargs = dict(
+        batch_size=args.batch_size, workers=args.workers,
+        cache_path=None if args.no_cache else args.cache_path,
+        cache_max_size=args.cache_max_size,
+        annotation_profile=args.annotation_profile,
+        annotator=args.annotator, writer_threads=args.writer_threads)
+    if sds:
+        kwargs.update(
+            incremental=not args.rebuild, output_format=args.output_format,
+            shard_size=args.shard_size, compression=args.compression,
+            lines=args.lines, schema_version=args.schema_version,
+            vocab=args.vocab, align=args.align)
+    return args, kwargs
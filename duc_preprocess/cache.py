@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+
+DEFAULT_MAX_SIZE = 2 ** 30
+# The cache the preprocess functions and scripts use unless given another
+# cache_path, or None for none, so that the single and multi document
+# builds of a release annotate each document only once.
+DEFAULT_CACHE_PATH = os.getenv(
+    "DUC_PREPROCESS_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "duc_preprocess",
+                 "annotations.db"))
+CACHE_HELP = (
+    "annotation cache database, shared by all builds (default "
+    "$DUC_PREPROCESS_CACHE or ~/.cache/duc_preprocess/annotations.db, "
+    "trimmed to --cache-max-size bytes, 1 GiB by default); --no-cache "
+    "to build without one")
+
+def get_cache_key(model_id, text):
+    data = "{}\n{}".format(model_id, text).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()
+
+class AnnotationCache(object):
+    '''
+    Persistent, content addressed cache of annotated paragraphs, stored
+    in a sqlite database at path. Entries are keyed by a hash of the
+    normalized paragraph text and the model_id of the annotator that
+    made them and hold the paragraph's list of sentence dicts.
+    When the cache grows past max_size bytes the least recently used
+    entries are evicted. Several processes may share the same cache.
+    '''
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory != "" and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.connection = sqlite3.connect(path, timeout=300)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS annotations ("
+                "key TEXT PRIMARY KEY, value TEXT, size INTEGER, "
+                "last_used REAL)")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS annotations_last_used "
+                "ON annotations (last_used)")
+        self.size = self.total_size()
+        if self.size > self.max_size:
+            self.evict()
+
+    def total_size(self):
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM annotations").fetchone()[0]
+
+    def get_many(self, keys):
+        '''
+        Return a dict from key to cached sentences for the keys that are
+        in the cache.
+        '''
+        found = {}
+        unique_keys = list(set(keys))
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            rows = self.connection.execute(
+                "SELECT key, value FROM annotations WHERE key IN ({})".format(
+                    ",".join("?" * len(chunk))), chunk)
+            for key, value in rows:
+                found[key] = json.loads(value)
+
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        if len(found) > 0:
+            now = time.time()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE annotations SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found])
+        return found
+
+    def put_many(self, items):
+        '''
+        Store (key, sentences) pairs, evicting old entries if the cache
+        is over max_size.
+        '''
+        now = time.time()
+        rows = []
+        for key, sentences in items:
+            value = json.dumps(sentences)
+            rows.append((key, value, len(value), now))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?)",
+                rows)
+        self.size += sum(row[2] for row in rows)
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        '''
+        Delete least recently used entries until the cache is at most 90%
+        of max_size.
+        '''
+        self.size = self.total_size()
+        target = int(self.max_size * .9)
+        if self.size <= target:
+            return
+        stale_keys = []
+        rows = self.connection.execute(
+            "SELECT key, size FROM annotations ORDER BY last_used").fetchall()
+        for key, size in rows:
+            if self.size <= target:
+                break
+            stale_keys.append((key,))
+            self.size -= size
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM annotations WHERE key = ?", stale_keys)
+        self.evictions += len(stale_keys)
+
+    def stats(self):
+        entries = self.connection.execute(
+            "SELECT COUNT(*) FROM annotations").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": entries,
+                "size": self.total_size(), "max_size": self.max_size}
+
+    def close(self):
+        self.connection.close()
+
+def format_stats(stats):
+    return "Annotation cache: {hits} hits, {misses} misses, " \
+        "{evictions} evictions, {entries} entries, {size} bytes".format(
+            **stats)
@@ -0,0 +1,127 @@
+import argparse
+import json
+import logging
+import os
+from .duc2001.main import open_release
+from .duc2001.sds import extract_sds_data as extract_duc2001_sds_data
+from .duc2002.main import open_releases
+from .duc2002.sds import extract_sds_data as extract_duc2002_sds_data
+from .annotation import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, DEFAULT_ANNOTATOR)
+from .build import add_build_arguments, parse_build_arguments
+from .cache import DEFAULT_MAX_SIZE, DEFAULT_CACHE_PATH
+from .dedup import SharedDocuments
+from .output import (
+    check_writer_threads, DEFAULT_SHARD_SIZE, DEFAULT_WRITER_THREADS)
+from .schema import LEGACY_SCHEMA_VERSION
+from .stats import BuildStats
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_duc2002_docnos(document_workspace):
+    docnos = set()
+    for docset_id in document_workspace.listdir("docs"):
+        docnos.update(document_workspace.listdir(
+            os.path.join("docs", docset_id)))
+    return docnos
+
+def preprocess_sds(output_directory, nist_data_path_2001=None,
+                   nist_document_data_path_2002=None,
+                   nist_summary_data_path_2002=None,
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                   cache_path=DEFAULT_CACHE_PATH,
+                   cache_max_size=DEFAULT_MAX_SIZE,
+                   incremental=True, output_format="json",
+                   shard_size=DEFAULT_SHARD_SIZE, compression=None,
+                   lines="document", schema_version=LEGACY_SCHEMA_VERSION,
+                   annotation_profile=DEFAULT_PROFILE,
+                   annotator=DEFAULT_ANNOTATOR, vocab=False, align=False,
+                   writer_threads=DEFAULT_WRITER_THREADS,
+                   share_documents=True, report_path=None):
+    '''
+    Preprocess the DUC 2001 and DUC 2002 single document summarization
+    data back to back, writing them to output_directory/duc2001 and
+    output_directory/duc2002 as duc2001.preprocess_sds and
+    duc2002.preprocess_sds would. The release paths fall back to the
+    same environment variables, and the other arguments are as for
+    those functions.
+    Both years draw on the same TREC sources, so if share_documents is
+    True, each DUC 2001 document whose DOCNO is also in the DUC 2002
+    release is kept once annotated, and a DUC 2002 document with the
+    same DOCNO and file contents is reused instead of being parsed and
+    annotated again (see dedup.SharedDocuments). Documents skipped as up
+    to date by an incremental DUC 2001 build are not shared.
+    Returns a dict with the stats of each year (see stats.BuildStats)
+    and, under "shared", the work the sharing saved, which is also
+    written to report_path as JSON if it is given.
+    '''
+    check_writer_threads(writer_threads, output_format)
+    stats_2001 = BuildStats()
+    workspace_2001 = open_release(nist_data_path_2001, stats=stats_2001)
+    stats_2002 = BuildStats()
+    document_workspace, summary_workspace = open_releases(
+        nist_document_data_path_2002, nist_summary_data_path_2002,
+        stats=stats_2002)
+
+    shared = None
+    if share_documents:
+        shared = SharedDocuments(get_duc2002_docnos(document_workspace))
+
+    kwargs = dict(
+        batch_size=batch_size, workers=workers, cache_path=cache_path,
+        cache_max_size=cache_max_size, incremental=incremental,
+        output_format=output_format, shard_size=shard_size,
+        compression=compression, lines=lines, schema_version=schema_version,
+        annotation_profile=annotation_profile, annotator=annotator,
+        vocab=vocab, align=align, writer_threads=writer_threads,
+        shared=shared)
+    output_2001 = os.path.join(output_directory, "duc2001")
+    logger.info("Writing duc 2001 sds data to %s ...", output_2001)
+    extract_duc2001_sds_data(
+        workspace_2001, output_2001, stats=stats_2001, **kwargs)
+    if shared is not None:
+        # Nothing built after DUC 2002 could reuse its documents.
+        shared.docnos = set()
+    output_2002 = os.path.join(output_directory, "duc2002")
+    logger.info("Writing duc 2002 sds data to %s ...", output_2002)
+    extract_duc2002_sds_data(
+        document_workspace, summary_workspace, output_2002,
+        stats=stats_2002, **kwargs)
+
+    report = {"duc2001": stats_2001.to_dict(),
+              "duc2002": stats_2002.to_dict()}
+    if shared is not None:
+        stats = BuildStats()
+        stats.merge(stats_2001)
+        stats.merge(stats_2002)
+        report["shared"] = shared.report(stats)
+        logger.info(shared.format(stats))
+    if report_path is not None:
+        with open(report_path, "w") as fp:
+            fp.write(json.dumps(report, indent=2, sort_keys=True))
+    return report
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duc2001-release-data", type=str, default=None)
+    parser.add_argument(
+        "--duc2002-document-release-data", type=str, default=None)
+    parser.add_argument(
+        "--duc2002-summary-release-data", type=str, default=None)
+    parser.add_argument("--output-path", type=str, required=True)
+    parser.add_argument("--no-share", action="store_true")
+    add_build_arguments(parser)
+
+    args, kwargs = parse_build_arguments(parser)
+    preprocess_sds(
+        args.output_path, nist_data_path_2001=args.duc2001_release_data,
+        nist_document_data_path_2002=args.duc2002_document_release_data,
+        nist_summary_data_path_2002=args.duc2002_summary_release_data,
+        share_documents=not args.no_share, report_path=args.report,
+        **kwargs)
+
+if __name__ == "__main__":
+    main()
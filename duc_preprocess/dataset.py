@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import gzip
+from .arrays import ArrayDataset
+from .schema import (
+    expand_input_data, expand_target_data, make_sentence_record)
+
+
+INPUT_FILE_PATTERN = re.compile(r"^(.+?)\.(.+)\.input\.json$")
+
+def get_item_index(dataset, key):
+    '''
+    Return the position of key in dataset, either an index (negative
+    indices count from the end) or a (docset_id, doc_id) tuple.
+    '''
+    if isinstance(key, tuple):
+        if key not in dataset.positions:
+            raise KeyError(key)
+        return dataset.positions[key]
+    return range(len(dataset))[key]
+
+def decode_records(records, expand):
+    '''
+    Return the data of a document from its JSON lines: a single line
+    holding the whole input or target data, or one line per sentence or
+    summary. Either way the result is in the legacy shape (see
+    schema.expand_input_data).
+    '''
+    if len(records) == 1 and (isinstance(records[0], list)
+                              or "schema_version" in records[0]):
+        return expand(records[0])
+    return records
+
+def read_shard(output_dir, location):
+    '''
+    Read the lines of a document from the shard location (see
+    output.ShardStream.write) points to. Compressed shards have to be
+    decompressed up to the document, so random access into them is
+    slower than into plain ones.
+    '''
+    path = os.path.join(output_dir, location["shard"])
+    if path.endswith(".gz"):
+        fp = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "Reading zstd shards requires the zstandard package.")
+        fp = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+    else:
+        fp = open(path, "rb")
+    with fp:
+        fp.seek(location["offset"])
+        data = fp.read(location["length"])
+    return [json.loads(line) for line in data.decode("utf-8").splitlines()]
+
+def has_arrays(output_dir):
+    return os.path.exists(os.path.join(output_dir, "arrays", "meta.json"))
+
+def read_manifest_keys(output_dir):
+    '''
+    Return the sorted (docset_id, doc_id) of the documents recorded in
+    output_dir/manifest.jsonl (see manifest.BuildManifest), or None if
+    there is none.
+    '''
+    path = os.path.join(output_dir, "manifest.jsonl")
+    if not os.path.exists(path):
+        return None
+    keys = set()
+    with open(path, "r") as fp:
+        for line in fp:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partial last line from an interrupted build.
+                continue
+            keys.add((record["docset_id"], record["doc_id"]))
+    return sorted(keys)
+
+class JsonDataset(object):
+    '''
+    Random access to the documents JsonWriter wrote to output_dir. The
+    documents are those recorded in its manifest, so only that is read
+    when opening; without a manifest the inputs directory is listed
+    instead. Each document's input and target files are read when it is
+    accessed.
+    '''
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.keys = read_manifest_keys(output_dir)
+        if self.keys is None:
+            self.keys = []
+            for fn in os.listdir(os.path.join(output_dir, "inputs")):
+                match = INPUT_FILE_PATTERN.match(fn)
+                if match is not None:
+                    self.keys.append(match.groups())
+            self.keys.sort()
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, key):
+        docset_id, doc_id = self.keys[get_item_index(self, key)]
+        name = "{}.{}".format(docset_id, doc_id)
+        with open(os.path.join(self.output_dir, "inputs",
+                               name + ".input.json"), "r") as fp:
+            inputs = expand_input_data(json.loads(fp.read()))
+        with open(os.path.join(self.output_dir, "targets",
+                               name + ".target.json"), "r") as fp:
+            targets = expand_target_data(json.loads(fp.read()))
+        return {"docset_id": docset_id, "doc_id": doc_id,
+                "inputs": inputs, "targets": targets}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class JsonlDataset(object):
+    '''
+    Random access to the documents ShardedJsonlWriter wrote to
+    output_dir. Opening reads index.jsonl only; each document's lines are
+    read from the input and target shards by offset when it is accessed.
+    '''
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.keys = []
+        self.locations = []
+        with open(os.path.join(output_dir, "index.jsonl"), "r") as fp:
+            for line in fp:
+                entry = json.loads(line)
+                self.keys.append((entry["docset_id"], entry["doc_id"]))
+                self.locations.append((entry["inputs"], entry["targets"]))
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, key):
+        index = get_item_index(self, key)
+        docset_id, doc_id = self.keys[index]
+        input_location, target_location = self.locations[index]
+        inputs = decode_records(
+            read_shard(self.output_dir, input_location), expand_input_data)
+        targets = decode_records(
+            read_shard(self.output_dir, target_location), expand_target_data)
+        return {"docset_id": docset_id, "doc_id": doc_id,
+                "inputs": inputs, "targets": targets}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class ArrayRecordDataset(object):
+    '''
+    Random access to the documents ArrayWriter wrote to output_dir, in
+    the same shape as JsonDataset returns them: the id arrays of an
+    ArrayDataset are decoded through its vocabularies as each document
+    is accessed.
+    '''
+
+    def __init__(self, output_dir):
+        self.arrays = ArrayDataset(output_dir)
+        self.positions = self.arrays.positions
+
+    def __len__(self):
+        return len(self.arrays)
+
+    def decode_sentence(self, sentence):
+        decoded = {"text": sentence["text"]}
+        for field in self.arrays.fields:
+            decoded[field] = self.arrays.decode(field, sentence[field])
+        return decoded
+
+    def __getitem__(self, key):
+        index = get_item_index(self, key)
+        document = self.arrays.documents[index]
+        inputs = []
+        for sentence_id, sentence in enumerate(
+                self.arrays.get_input_sentences(index), 1):
+            record = {"docset_id": document["docset_id"],
+                      "doc_id": document["doc_id"],
+                      "date": document["date"]}
+            inputs.append(make_sentence_record(
+                sentence_id, self.decode_sentence(sentence), record))
+        targets = self.arrays.get_summaries(index)
+        for summary in targets:
+            summary["sentences"] = [self.decode_sentence(sentence)
+                                    for sentence in summary["sentences"]]
+        return {"docset_id": document["docset_id"],
+                "doc_id": document["doc_id"],
+                "inputs": inputs, "targets": targets}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+def load_sds(output_dir, split=None, arrays=False):
+    '''
+    Open the single document data preprocess_sds wrote to output_dir, in
+    any output format, for random access by index or by (docset_id,
+    doc_id) and for iteration. split is "train" or "test" for DUC 2001,
+    whose splits are written to subdirectories, and None for DUC 2002.
+    Documents are read lazily. Each is a dict of its "docset_id",
+    "doc_id", "inputs" (a list of sentence records) and "targets" (a
+    list of summaries), in the legacy schema whatever format and schema
+    the data was written in.
+    If arrays is True, the data must be in the array format, and its
+    ArrayDataset, whose documents hold vocabulary id arrays, is returned
+    instead.
+    '''
+    if split is not None:
+        output_dir = os.path.join(output_dir, split)
+    if arrays:
+        if not has_arrays(output_dir):
+            raise Exception(
+                "No array data found in {}".format(output_dir))
+        return ArrayDataset(output_dir)
+    if has_arrays(output_dir):
+        return ArrayRecordDataset(output_dir)
+    elif os.path.exists(os.path.join(output_dir, "index.jsonl")):
+        return JsonlDataset(output_dir)
+    elif os.path.isdir(os.path.join(output_dir, "inputs")):
+        return JsonDataset(output_dir)
+    else:
+        raise Exception(
+            "No preprocessed data found in {}".format(output_dir))
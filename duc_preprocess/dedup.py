@@ -0,0 +1,99 @@
+import os
+from .spans import count_tokens
+
+
+class SharedDocuments(object):
+    '''
+    Annotated documents keyed by DOCNO and the hash of their release
+    file, shared between the builds of releases that draw on the same
+    sources, so that a document in several releases is parsed and
+    annotated only once. The document file names are their DOCNOs (see
+    document_parser.read_input_docs), so a document can be looked up
+    before it is parsed.
+    If docnos is given, only documents with those DOCNOs are kept, e.g.
+    those also in the release built next, so memory use stays small.
+    Counts what the reused documents that are written would have cost to
+    annotate again. Documents being built are keyed by docset and doc id,
+    since several docsets with the same DOCNO may be in flight at once.
+    '''
+
+    def __init__(self, docnos=None):
+        self.docnos = set(docnos) if docnos is not None else None
+        self.documents = {}
+        self.pending = {}
+        self.hits = {}
+        self.reused_documents = 0
+        self.reused_paragraphs = 0
+        self.reused_sentences = 0
+        self.reused_tokens = 0
+
+    def get(self, docset_id, path, file_hash):
+        '''
+        Return the annotated document of the release file at path of
+        docset docset_id with contents hashing to file_hash if it was
+        built before, else None.
+        '''
+        key = (os.path.basename(path), file_hash)
+        entry = self.documents.get(key)
+        if entry is None:
+            return None
+        document, paragraphs = entry
+        self.hits[(docset_id, document["doc_id"])] = key
+        return document
+
+    def expect(self, docset_id, doc_id, path, file_hash, paragraphs):
+        '''
+        Note that the document doc_id of docset docset_id, parsed from the
+        file at path into paragraphs, will be annotated, so that add can
+        key it.
+        '''
+        docno = os.path.basename(path)
+        if self.docnos is None or docno in self.docnos:
+            self.pending[(docset_id, doc_id)] = (
+                (docno, file_hash), len(paragraphs))
+
+    def add(self, docset_id, doc_id, document):
+        '''
+        Called for each document doc_id of docset docset_id that is
+        written: keep the annotated document if expect was called for it,
+        or count it as reused if get returned it. Documents get returned
+        that are not written, e.g. because they are up to date, are not
+        counted.
+        '''
+        entry = self.pending.pop((docset_id, doc_id), None)
+        if entry is not None:
+            key, paragraphs = entry
+            self.documents[key] = (document, paragraphs)
+            return
+        key = self.hits.pop((docset_id, doc_id), None)
+        if key is None:
+            return
+        document, paragraphs = self.documents[key]
+        self.reused_documents += 1
+        self.reused_paragraphs += paragraphs
+        self.reused_sentences += len(document["sentences"])
+        self.reused_tokens += sum(
+            count_tokens(sentence) for sentence in document["sentences"])
+
+    def report(self, stats=None):
+        '''
+        Return a dict of the documents, paragraphs, sentences and tokens
+        reused rather than annotated again and, given the BuildStats of
+        the builds, an estimate of the annotation time that saved.
+        '''
+        report = {"shared_documents": len(self.documents),
+                  "reused_documents": self.reused_documents,
+                  "reused_paragraphs": self.reused_paragraphs,
+                  "reused_sentences": self.reused_sentences,
+                  "reused_tokens": self.reused_tokens}
+        if stats is not None and stats.counts["tokens"] > 0:
+            report["annotated_tokens"] = stats.counts["tokens"]
+            report["estimated_seconds_saved"] = (
+                self.reused_tokens * stats.seconds["annotate"]
+                / stats.counts["tokens"])
+        return report
+
+    def format(self, stats=None):
+        return "Shared documents: " + ", ".join(
+            "{} {}".format(key, value)
+            for key, value in sorted(self.report(stats).items()))
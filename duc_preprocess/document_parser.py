@@ -0,0 +1,100 @@
+import os
+import re
+from .annotation import (
+    annotate_documents, annotate_paragraphs, DEFAULT_BATCH_SIZE)
+from .sgml import scan_tags
+from .sources import get_source_parser
+
+
+# Matched against the attributes of a <SUM> tag (see sgml.scan_tags).
+PERDOC_HEADER = re.compile(
+    r'.*?TYPE="PERDOC"\s+SIZE="(.*?)"\s+DOCREF="(.*?)"'
+    r'\s+SELECTOR="(.*?)"\s+SUMMARIZER="(.*?)"\s*', flags=re.DOTALL)
+
+# Bump when a change to the parsers changes their output, so that
+# incremental builds rebuild every document.
+PARSER_VERSION = "1"
+
+def get_normalized_sentences(text, annotator, cache=None):
+    return annotate_paragraphs([text], annotator, cache=cache)[0]
+
+def read_perdocs_xml(path, xml):
+
+    tags = scan_tags(xml)
+
+    headers_found = 0
+    data = {}
+    for start, end, attributes in tags.get("SUM", []):
+        header_match = PERDOC_HEADER.fullmatch(attributes)
+        if header_match is None:
+            continue
+        headers_found += 1
+        if end is None:
+            continue
+        size, doc_id, selector, summarizer = header_match.groups()
+        size = int(size)
+        doc_id = doc_id.strip()
+        summary_text = xml[start:end]
+        data[doc_id] = {"input_ids": [doc_id], "paragraphs": [summary_text],
+                        "selector": selector, "summarizer": summarizer,
+                        "size": size}
+
+    if len(data) != headers_found:
+        raise Exception("Error in summary xml {}".format(path))
+    return data
+
+def parse_perdocs_xml(path, xml, annotator, batch_size=DEFAULT_BATCH_SIZE,
+                      cache=None):
+    data = read_perdocs_xml(path, xml)
+    doc_ids = list(data.keys())
+    summaries = annotate_documents(
+        [data[doc_id] for doc_id in doc_ids], annotator,
+        batch_size=batch_size, cache=cache)
+    return dict(zip(doc_ids, summaries))
+
+def read_mds_xml(path, xml):
+    SUM_PATT = r'<SUM.*?TYPE="MULTI"\s+SIZE="(.*?)"\s+DOCREF="(.*?)"\s+SELECTOR="(.*?)"\s+SUMMARIZER="(.*?)"\s*>(.*?)</SUM>'
+
+    match = re.search(SUM_PATT, xml, flags=re.DOTALL)
+    
+    if match is None:
+        raise Exception(
+            "Could not find summary xml tag for file: {}".format(path))
+
+    size, docref_string, selector, summarizer, raw_text = match.groups()
+    size = int(size)
+    input_document_ids = re.split(r"\s+", docref_string)
+    return {"input_ids": input_document_ids, 
+            "summarizer": summarizer,
+            "selector": selector,
+            "paragraphs": [raw_text],
+            "size": size}
+
+def parse_mds_xml(path, xml, annotator, cache=None):
+    return annotate_documents(
+        [read_mds_xml(path, xml)], annotator, cache=cache)[0]
+
+def read_input_docs(files):
+    '''
+    Parse a list of (path, xml) input document files into document dicts
+    holding the raw paragraph text of each document. The source parser
+    of each file is picked by its name, which is the document's DOCNO
+    (see sources.register_source).
+    '''
+    data = []
+    for path, xml in files:
+
+        _, fn = os.path.split(path)
+
+        doc_id, paragraphs, date = get_source_parser(fn)(xml)
+
+        data.append(
+            {"doc_id": doc_id, "paragraphs": paragraphs, "date": date})
+
+    return data
+
+def parse_input_docs(files, annotator, batch_size=DEFAULT_BATCH_SIZE,
+                     cache=None):
+    return annotate_documents(
+        read_input_docs(files), annotator, batch_size=batch_size,
+        cache=cache)
@@ -1 +1 @@
-from .main import preprocess_sds
+from .main import preprocess_sds, preprocess_mds
@@ -1,39 +1,125 @@
 import os
-import tempfile
-import tarfile
-import shutil
-from .repair import run_repairs
+import logging
+from .repair import PATCH_TABLE
 from .sds import extract_sds_data
+from .mds import extract_mds_data, MDS_SIZES
+from ..annotation import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, DEFAULT_ANNOTATOR)
+from ..archive import ArchiveWorkspace
+from ..cache import DEFAULT_MAX_SIZE, DEFAULT_CACHE_PATH
+from ..output import (
+    check_writer_threads, DEFAULT_SHARD_SIZE, DEFAULT_WRITER_THREADS)
+from ..schema import LEGACY_SCHEMA_VERSION
+from ..stats import BuildStats
 
 
-def preprocess_sds(output_directory, nist_data_path=None):
+logger = logging.getLogger(__name__)
+
+
+def open_release(nist_data_path=None, stats=None):
     '''
-    Preprocess DUC 2001 single document summarization data.
-    Gathers documents and multiple 100 word human reference abstracts.
-    If nist_data_path is None, fall back to env variable DUC2001_ORIGINAL
-    and fail if that is not set.
+    Read the release tarball at nist_data_path, or DUC2001_ORIGINAL if
+    it is None, in memory and return its ArchiveWorkspace. Known errors
+    in the release are patched as files are read.
     '''
-    
     if nist_data_path is None:
-        print("Checking environment variable 'DUC2001_ORIGINAL' ...")
+        logger.info("Checking environment variable 'DUC2001_ORIGINAL' ...")
         nist_data_path = os.getenv('DUC2001_ORIGINAL', None)
 
         if nist_data_path is None:
             raise Exception(
                 "DUC2001_ORIGINAL is not set and nist_data_path is None.")
 
-    try:
-
-        tmpdir = tempfile.mkdtemp()
-        
-        with tarfile.open(nist_data_path) as fp:
-            fp.extractall(tmpdir)
-        
-        workspace = os.path.join(tmpdir, "DUC2001_Summarization_Documents")
-
-        run_repairs(workspace)
-        print("Writing duc 2001 sds data to {} ...".format(output_directory))
-        extract_sds_data(workspace, output_directory)
-    
-    finally:
-        shutil.rmtree(tmpdir)
+    return ArchiveWorkspace.from_tarfile(
+        nist_data_path, root="DUC2001_Summarization_Documents",
+        patches=PATCH_TABLE, stats=stats)
+
+def preprocess_sds(output_directory, nist_data_path=None,
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                   cache_path=DEFAULT_CACHE_PATH,
+                   cache_max_size=DEFAULT_MAX_SIZE,
+                   incremental=True, output_format="json",
+                   shard_size=DEFAULT_SHARD_SIZE, compression=None,
+                   lines="document", schema_version=LEGACY_SCHEMA_VERSION,
+                   annotation_profile=DEFAULT_PROFILE,
+                   annotator=DEFAULT_ANNOTATOR, vocab=False, align=False,
+                   writer_threads=DEFAULT_WRITER_THREADS, report_path=None):
+    '''
+    Preprocess DUC 2001 single document summarization data.
+    Gathers documents and multiple 100 word human reference abstracts.
+    If nist_data_path is None, fall back to env variable DUC2001_ORIGINAL
+    and fail if that is not set.
+    The tarball is read into memory, with each file kept compressed;
+    nothing but the output and the annotation cache is written to disk.
+    batch_size is the number of paragraphs annotated per batch.
+    workers is the number of processes used to annotate docsets.
+    cache_path is the annotation cache database that is reused across
+    runs, and by preprocess_mds, by default cache.DEFAULT_CACHE_PATH or
+    None for no cache; it is trimmed to cache_max_size bytes.
+    If incremental is True, documents that are up to date in
+    output_directory are not rebuilt.
+    output_format, shard_size, compression, lines and schema_version
+    select the output files written (see build.build_sds).
+    annotation_profile is "full", "tokens+pos" or "tokens-only"; the
+    lighter profiles load fewer spacy components and leave pos and ne out
+    of the output.
+    annotator is "spacy" or "regex"; the regex annotator needs no spacy
+    model and is much faster, but only supports the tokens-only profile.
+    If vocab is True, token and tag frequencies are written alongside the
+    data (see build.build_sds).
+    If align is True, input sentences are aligned with their summaries
+    and oracle extract labels computed (see alignment.align_sds).
+    writer_threads is the number of threads that write the output while
+    later docsets are annotated; only the json format can use several.
+    Returns a BuildStats of the time spent in each stage and the number
+    of documents, sentences, tokens and bytes processed, which is also
+    written to report_path as JSON if it is given.
+    '''
+    check_writer_threads(writer_threads, output_format)
+    stats = BuildStats()
+    workspace = open_release(nist_data_path, stats=stats)
+
+    logger.info("Writing duc 2001 sds data to %s ...", output_directory)
+    extract_sds_data(
+        workspace, output_directory, batch_size=batch_size,
+        workers=workers, cache_path=cache_path,
+        cache_max_size=cache_max_size, incremental=incremental,
+        output_format=output_format, shard_size=shard_size,
+        compression=compression, lines=lines, schema_version=schema_version,
+        annotation_profile=annotation_profile, annotator=annotator,
+        vocab=vocab, align=align, writer_threads=writer_threads,
+        stats=stats)
+    if report_path is not None:
+        stats.save(report_path)
+    return stats
+
+def preprocess_mds(output_directory, nist_data_path=None,
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                   cache_path=DEFAULT_CACHE_PATH,
+                   cache_max_size=DEFAULT_MAX_SIZE,
+                   annotation_profile=DEFAULT_PROFILE,
+                   annotator=DEFAULT_ANNOTATOR, sizes=MDS_SIZES,
+                   writer_threads=DEFAULT_WRITER_THREADS, report_path=None):
+    '''
+    Preprocess DUC 2001 multi document summarization data.
+    Gathers the documents of each docset and its 50, 100, 200 and 400
+    word human reference abstracts (those of sizes). Every document is
+    written and annotated once, and the docsets and abstracts refer to
+    it by id (see output.MdsJsonWriter). With the cache_path used for
+    preprocess_sds, by default the same, its annotations of the documents
+    are reused.
+    The other arguments are as for preprocess_sds.
+    '''
+    stats = BuildStats()
+    workspace = open_release(nist_data_path, stats=stats)
+
+    logger.info("Writing duc 2001 mds data to %s ...", output_directory)
+    extract_mds_data(
+        workspace, output_directory, batch_size=batch_size,
+        workers=workers, cache_path=cache_path,
+        cache_max_size=cache_max_size,
+        annotation_profile=annotation_profile, annotator=annotator,
+        sizes=sizes, writer_threads=writer_threads, stats=stats)
+    if report_path is not None:
+        stats.save(report_path)
+    return stats
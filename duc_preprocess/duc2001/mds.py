@@ -0,0 +1,110 @@
+import os
+import argparse
+import functools
+import logging
+from .repair import PATCH_TABLE
+from .sds import get_docset_ids_from_dir
+from ..archive import get_workspace
+from ..build import build_mds, add_build_arguments, parse_build_arguments
+
+
+logger = logging.getLogger(__name__)
+
+# Word counts of the multi document abstracts, which are also the names
+# of their files in each summary directory.
+MDS_SIZES = ["50", "100", "200", "400"]
+
+
+def get_summary_files(workspace, summary_dir, sizes):
+    summary_files = []
+    for size in sizes:
+        path = os.path.join(summary_dir, size)
+        if workspace.exists(path):
+            summary_files.append((path, workspace.read(path)))
+    return summary_files
+
+def get_input_files(workspace, docs_dir):
+    input_paths = [os.path.join(docs_dir, fn)
+                   for fn in workspace.listdir(docs_dir)]
+    return [(path, workspace.read(path)) for path in input_paths]
+
+def get_training_mds_docsets(docset_ids, workspace, sizes=MDS_SIZES):
+    for docset_id in docset_ids:
+        docset_path = os.path.join("data", "training", docset_id)
+        summary_ids = [dn for dn in workspace.listdir(docset_path)
+                       if dn.startswith(docset_id)]
+        assert len(summary_ids) == 1
+        summary_files = get_summary_files(
+            workspace, os.path.join(docset_path, summary_ids[0]), sizes)
+        input_files = get_input_files(
+            workspace, os.path.join(docset_path, "docs"))
+        yield docset_id, summary_files, input_files
+
+def get_test_mds_docsets(docset_ids, workspace, sizes=MDS_SIZES):
+    '''
+    Yield the test docsets with the multi document summaries of both
+    the original and the duplicate summarizers.
+    '''
+    summary_dirs = []
+    summary_ids = set()
+    for summaries in ["original.summaries", "duplicate.summaries"]:
+        summary_path = os.path.join("data", "test", summaries)
+        for fn in sorted(workspace.listdir(summary_path)):
+            if fn not in summary_ids:
+                summary_ids.add(fn)
+                summary_dirs.append((fn, os.path.join(summary_path, fn)))
+
+    for docset_id in docset_ids:
+        summary_files = []
+        for summary_id, summary_dir in summary_dirs:
+            if summary_id.startswith(docset_id):
+                summary_files.extend(
+                    get_summary_files(workspace, summary_dir, sizes))
+        input_files = get_input_files(
+            workspace, os.path.join("data", "test", "docs", docset_id))
+        yield docset_id, summary_files, input_files
+
+def get_mds_splits(workspace, sizes=MDS_SIZES):
+    for split, docs_dir, get_docsets in [
+            ("train", os.path.join("data", "training"),
+             get_training_mds_docsets),
+            ("test", os.path.join("data", "test", "docs"),
+             get_test_mds_docsets)]:
+        docset_ids = get_docset_ids_from_dir(workspace, docs_dir)
+        logger.info("Reading %s docsets ...", split)
+        yield split, get_docsets(docset_ids, workspace, sizes=sizes)
+
+def open_mds_splits(release_data_path, stats, sizes=MDS_SIZES):
+    workspace = get_workspace(
+        release_data_path, patches=PATCH_TABLE, stats=stats)
+    return get_mds_splits(workspace, sizes=sizes)
+
+def extract_mds_data(release_data_path, output_dir, sizes=MDS_SIZES,
+                     **kwargs):
+    '''
+    Write the DUC 2001 multi document train and test data, with the
+    abstracts of sizes, to output_dir/train and output_dir/test.
+    release_data_path is as for sds.extract_sds_data, and the other
+    arguments are as for build.build_mds, which returns stats.
+    '''
+    return build_mds(
+        functools.partial(open_mds_splits, release_data_path, sizes=sizes),
+        output_dir, **kwargs)
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--release-data", type=str, required=True)
+    parser.add_argument("--output-path", type=str, required=True)
+    parser.add_argument(
+        "--sizes", nargs="+", choices=MDS_SIZES, default=MDS_SIZES)
+    add_build_arguments(parser, sds=False)
+
+    args, kwargs = parse_build_arguments(parser, sds=False)
+    stats = extract_mds_data(
+        args.release_data, args.output_path, sizes=args.sizes, **kwargs)
+    if args.report is not None:
+        stats.save(args.report)
+
+if __name__ == "__main__":
+    main()
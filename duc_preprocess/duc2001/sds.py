@@ -1,43 +1,42 @@
 import os
 import re
-import json
 import argparse
-from . import document_parser
-import spacy
+import functools
+import logging
+from .repair import PATCH_TABLE
+from ..archive import get_workspace
+from ..build import build_sds, add_build_arguments, parse_build_arguments
+from ..profiling import profile_call, PROFILERS
 
 
-def get_training_summaries(docset_ids, release_path, nlp):
-    id2summary = {}
+logger = logging.getLogger(__name__)
+
+
+def get_training_docsets(docset_ids, workspace):
     for docset_id in docset_ids:
-        docset_path = os.path.join(
-            release_path, "data", "training", docset_id)
-        summary_ids = [dn for dn in os.listdir(docset_path)
+        docset_path = os.path.join("data", "training", docset_id)
+        summary_ids = [dn for dn in workspace.listdir(docset_path)
                        if dn.startswith(docset_id)]
         assert len(summary_ids) == 1
-        summary_id = summary_ids[0]
-        summary_path = os.path.join(
-            docset_path, summary_id, "perdocs")
-        
-        summaries = document_parser.parse_perdocs_xml(summary_path, nlp)
-        print("Found {} summaries for docset {} ...".format(
-            len(summaries), docset_id))    
-
-        for doc_id, summary in summaries.items():
-            summary["docset_id"] = docset_id
-            id2summary[(docset_id, doc_id)] = [summary]
-
-    return id2summary
-
-def get_test_summaries(docset_ids, release_path, nlp):
-
-    orig_summary_path = os.path.join(
-        release_path, "data", "test", "original.summaries")
-    all_orig_summary_ids = [fn for fn in os.listdir(orig_summary_path)]
-    dupl_summary_path = os.path.join(
-        release_path, "data", "test", "duplicate.summaries")
-    all_dupl_summary_ids = [fn for fn in os.listdir(dupl_summary_path)]
-
-    id2summary = {}
+        summary_path = os.path.join(docset_path, summary_ids[0], "perdocs")
+        summary_files = [
+            (summary_path, workspace.read(summary_path), True)]
+
+        docs_dir = os.path.join(docset_path, "docs")
+        input_paths = [os.path.join(docs_dir, fn) 
+                       for fn in workspace.listdir(docs_dir)]
+        input_files = [(path, workspace.read(path)) for path in input_paths]
+        yield docset_id, summary_files, input_files
+
+def get_test_docsets(docset_ids, workspace):
+
+    orig_summary_path = os.path.join("data", "test", "original.summaries")
+    all_orig_summary_ids = [
+        fn for fn in workspace.listdir(orig_summary_path)]
+    dupl_summary_path = os.path.join("data", "test", "duplicate.summaries")
+    all_dupl_summary_ids = [
+        fn for fn in workspace.listdir(dupl_summary_path)]
+
     for docset_id in docset_ids:
 
         orig_summary_ids = [fn for fn in all_orig_summary_ids 
@@ -45,199 +44,76 @@ def get_test_summaries(docset_ids, release_path, nlp):
         dupl_summary_ids = [fn for fn in all_dupl_summary_ids 
                             if fn.startswith(docset_id) and 
                             fn not in orig_summary_ids]
+        summary_files = []
         for orig_summary_id in orig_summary_ids:
-            orig_summary_path = os.path.join(
-                release_path, "data", "test", "original.summaries", 
-                orig_summary_id, "perdocs")
-            if not os.path.exists(orig_summary_path):
+            path = os.path.join(
+                orig_summary_path, orig_summary_id, "perdocs")
+            if not workspace.exists(path):
                 continue
-            summary_data = document_parser.parse_perdocs_xml(
-                orig_summary_path, nlp)
-            for doc_id, summary in summary_data.items():
-                assert (docset_id, doc_id) not in id2summary
-                summary["docset_id"] = docset_id
-                id2summary[(docset_id, doc_id)] = [summary]
+            summary_files.append((path, workspace.read(path), True))
         for dupl_summary_id in dupl_summary_ids:
-            dupl_summary_path = os.path.join(
-                release_path, "data", "test", "duplicate.summaries", 
-                dupl_summary_id, "perdocs")
-            if not os.path.exists(dupl_summary_path):
+            path = os.path.join(
+                dupl_summary_path, dupl_summary_id, "perdocs")
+            if not workspace.exists(path):
                 continue
-            summary_data = document_parser.parse_perdocs_xml(
-                dupl_summary_path, nlp)
-            for doc_id, summary in summary_data.items():
-                summary["docset_id"] = docset_id
-                if (docset_id, doc_id) not in id2summary:
-                    id2summary[(docset_id, doc_id)] = []
-                id2summary[(docset_id, doc_id)].append(summary)
-        
-    for key, summaries in id2summary.items():
-        print("Found {} summaries for doc id {}".format(
-            len(summaries), key))
-
-    return id2summary
-
-def make_train_data_from_release_data(root_path, output_root_path, nlp):
-
-    docset_ids = get_docset_ids_from_dir(
-        os.path.join(root_path, "data", "training"))
-    
-    print("Creating training set input and target directories...")
-    train_summary_dir = os.path.join(output_root_path, "train", "targets")
-    validate_directory(train_summary_dir)
-    train_inputs_dir = os.path.join(output_root_path, "train", "inputs")
-    validate_directory(train_inputs_dir)
-
-    print("Reading training summaries...")
-    id2summary = get_training_summaries(
-        docset_ids, root_path, nlp)
-   
-    docs = get_training_inputs(docset_ids, root_path, nlp)
-
-    for key, summaries in id2summary.items():
-        print(key)
-        assert key in docs
-        doc = docs[key]
-
-        datestr = str(doc["date"])
-        input_data = []
-        for s, sentence in enumerate(doc["sentences"], 1):
-            input_data.append(
-                {"docset_id": key[0],
-                 "doc_id": key[1],
-                 "date": datestr,
-                 "sentence_id": s,
-                 "text": sentence["text"],
-                 "pos": sentence["pos"],
-                 "ne": sentence["ne"],
-                 "tokens": sentence["tokens"]})
-        
-        input_path = os.path.join(
-            train_inputs_dir, "{}.{}.input.json".format(key[0], key[1]))
-        
-        print("Writing input data {} ...".format(input_path))
-        with open(input_path, "w") as fp:
-            fp.write(json.dumps(input_data))
-
-        summary_path = os.path.join(
-            train_summary_dir, "{}.{}.target.json".format(key[0], key[1]))
-        print("Writing target data {} ...".format(summary_path))
-        with open(summary_path, "w") as fp:
-            fp.write(json.dumps(summaries))
-
-
-    return
-
-def get_training_inputs(docset_ids, root_path, nlp):
-
-    docs = {}
-    for docset_id in docset_ids:
-        docset_dir = os.path.join(
-            root_path, "data", "training", docset_id, "docs")
-        paths = [os.path.join(docset_dir, fn) 
-                 for fn in os.listdir(docset_dir)]
-        docset_docs = document_parser.parse_input_docs(paths, nlp)
-        for doc in docset_docs:
-            docs[(docset_id, doc["doc_id"])] = doc
-        print("Found {} docs for docset {}".format(
-            len(docset_docs), docset_id))
-    return docs
-
-def make_test_data_from_release_data(root_path, output_root_path, nlp):
-
-    docset_ids = get_docset_ids_from_dir(
-        os.path.join(root_path, "data", "test", "docs"))
-    
-    print("Creating test set input and target directories...")
-    test_summary_dir = os.path.join(output_root_path, "test", "targets")
-    validate_directory(test_summary_dir)
-    test_inputs_dir = os.path.join(output_root_path, "test", "inputs")
-    validate_directory(test_inputs_dir)
-
-    print("Reading test summaries...")
-    id2summaries = get_test_summaries(docset_ids, root_path, nlp)
-
-    docs = get_test_inputs(docset_ids, root_path, nlp)
-
-    for key, summaries in id2summaries.items():
-        print(key)
-        assert key in docs
-        doc = docs[key]
-
-        datestr = str(doc["date"])
-        input_data = []
-        for s, sentence in enumerate(doc["sentences"], 1):
-            input_data.append(
-                {"docset_id": key[0],
-                 "doc_id": key[1],
-                 "date": datestr,
-                 "sentence_id": s,
-                 "text": sentence["text"],
-                 "pos": sentence["pos"],
-                 "ne": sentence["ne"],
-                 "tokens": sentence["tokens"]})
-        
-        input_path = os.path.join(
-            test_inputs_dir, "{}.{}.input.json".format(key[0], key[1]))
-        
-        print("Writing input data {} ...".format(input_path))
-        with open(input_path, "w") as fp:
-            fp.write(json.dumps(input_data))
-
-        summary_path = os.path.join(
-            test_summary_dir, "{}.{}.target.json".format(key[0], key[1]))
-        print("Writing target data {} ...".format(summary_path))
-        with open(summary_path, "w") as fp:
-            fp.write(json.dumps(summaries))
-
-
-
-def get_test_inputs(docset_ids, root_path, nlp):
-    docs = {}
-    for docset_id in docset_ids:
-        docset_dir = os.path.join(
-            root_path, "data", "test", "docs", docset_id) 
-        
-        input_paths = [os.path.join(docset_dir, fn) 
-                       for fn in os.listdir(docset_dir)]
-
-        docset_docs = document_parser.parse_input_docs(input_paths, nlp)
-        for doc in docset_docs:
-            docs[(docset_id, doc["doc_id"])] = doc
+            summary_files.append((path, workspace.read(path), False))
 
-        print("Found {} docs for docset {}".format(
-            len(docset_docs), docset_id))
-    return docs
+        docs_dir = os.path.join("data", "test", "docs", docset_id) 
+        input_paths = [os.path.join(docs_dir, fn) 
+                       for fn in workspace.listdir(docs_dir)]
+        input_files = [(path, workspace.read(path)) for path in input_paths]
+        yield docset_id, summary_files, input_files
 
-def validate_directory(path):
-    if path != "" and not os.path.exists(path):
-        os.makedirs(path)
+def get_docset_ids_from_dir(workspace, path):
 
-def get_docset_ids_from_dir(path):
-
-    docset_ids = [dn for dn in os.listdir(path)
+    docset_ids = [dn for dn in workspace.listdir(path)
                   if re.search(r"^d\d\d[a-z]", dn)]
     assert len(docset_ids) == 30
     return docset_ids
 
-def extract_sds_data(release_data_path, output_dir, nlp=None):
-    if nlp is None:
-        nlp = spacy.load('en', parser=False)
-
-    make_train_data_from_release_data(
-        release_data_path, output_dir, nlp)
-    make_test_data_from_release_data(
-        release_data_path, output_dir, nlp)
+def get_sds_splits(workspace):
+    for split, docs_dir, get_docsets in [
+            ("train", os.path.join("data", "training"),
+             get_training_docsets),
+            ("test", os.path.join("data", "test", "docs"),
+             get_test_docsets)]:
+        docset_ids = get_docset_ids_from_dir(workspace, docs_dir)
+        logger.info("Reading %s docsets ...", split)
+        yield split, get_docsets(docset_ids, workspace)
+
+def open_sds_splits(release_data_path, stats):
+    workspace = get_workspace(
+        release_data_path, patches=PATCH_TABLE, stats=stats)
+    return get_sds_splits(workspace)
+
+def extract_sds_data(release_data_path, output_dir, **kwargs):
+    '''
+    Write the DUC 2001 single document train and test data to
+    output_dir/train and output_dir/test.
+    release_data_path is either the path to an extracted release
+    directory, whose files are repaired with PATCH_TABLE as they are read,
+    or an ArchiveWorkspace of the release tarball.
+    The other arguments are as for build.build_sds, which returns stats.
+    '''
+    return build_sds(
+        functools.partial(open_sds_splits, release_data_path), output_dir,
+        **kwargs)
 
 def main():
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--release-data", type=str, required=True)
     parser.add_argument("--output-path", type=str, required=True)
+    add_build_arguments(parser)
+    parser.add_argument("--profile", choices=PROFILERS, default=None)
+    parser.add_argument("--profile-output", type=str, default=None)
+
+    args, kwargs = parse_build_arguments(parser)
+    stats = profile_call(
+        args.profile, args.profile_output, extract_sds_data,
+        args.release_data, args.output_path, **kwargs)
+    if args.report is not None:
+        stats.save(args.report)
 
-    args = parser.parse_args()
-    
-    extract_sds_data(args.release_data, args.output_path)
-        
 if __name__ == "__main__":
     main()
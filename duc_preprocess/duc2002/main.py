@@ -1,23 +1,30 @@
 import os
-import tempfile
-import tarfile
-import shutil
+import logging
 from .sds import extract_sds_data
+from .mds import extract_mds_data, MDS_SIZES
+from ..annotation import (
+    DEFAULT_BATCH_SIZE, DEFAULT_PROFILE, DEFAULT_ANNOTATOR)
+from ..archive import ArchiveWorkspace
+from ..cache import DEFAULT_MAX_SIZE, DEFAULT_CACHE_PATH
+from ..output import (
+    check_writer_threads, DEFAULT_SHARD_SIZE, DEFAULT_WRITER_THREADS)
+from ..schema import LEGACY_SCHEMA_VERSION
+from ..stats import BuildStats
 
 
-def preprocess_sds(output_directory, nist_document_data_path=None, 
-                   nist_summary_data_path=None):
+logger = logging.getLogger(__name__)
+
+
+def open_releases(nist_document_data_path=None, nist_summary_data_path=None,
+                  stats=None):
     '''
-    Preprocess DUC 2002 single document summarization data.
-    Gathers documents and multiple 100 word human reference abstracts.
-    If nist_document_data_path is None, fall back to env variable
-    DUC2002_ORIGINAL_DOCS and fail if that is not set.
-    If nist_summary_data_path is None, fall back to env variable
-    DUC2002_ORIGINAL_SUMMARIES and fail if that is not set.
+    Read the document and summary tarballs, or those at
+    DUC2002_ORIGINAL_DOCS and DUC2002_ORIGINAL_SUMMARIES if their paths
+    are None, in memory and return their ArchiveWorkspaces.
     '''
-    
     if nist_document_data_path is None:
-        print("Checking environment variable 'DUC2002_ORIGINAL_DOCS' ...")
+        logger.info(
+            "Checking environment variable 'DUC2002_ORIGINAL_DOCS' ...")
         nist_document_data_path = os.getenv('DUC2002_ORIGINAL_DOCS', None)
 
         if nist_document_data_path is None:
@@ -26,7 +33,8 @@ def preprocess_sds(output_directory, nist_document_data_path=None,
                 "is None.")
 
     if nist_summary_data_path is None:
-        print("Checking environment variable 'DUC2002_ORIGINAL_SUMMARIES' ...")
+        logger.info(
+            "Checking environment variable 'DUC2002_ORIGINAL_SUMMARIES' ...")
         nist_summary_data_path = os.getenv('DUC2002_ORIGINAL_SUMMARIES', None)
 
         if nist_summary_data_path is None:
@@ -34,26 +42,107 @@ def preprocess_sds(output_directory, nist_document_data_path=None,
                 "DUC2002_ORIGINAL_SUMMARIES is not set and "
                 "nist_summaries_data_path is None.")
 
-    try:
-
-        tmpdir = tempfile.mkdtemp()
-        
-        with tarfile.open(nist_document_data_path) as fp:
-            fp.extractall(tmpdir)
-        
-        doc_workspace = os.path.join(tmpdir, "DUC2002_Summarization_Documents")
-
-        inner_tar  = os.path.join(doc_workspace, "duc2002testdocs.tar")
-        with tarfile.open(inner_tar) as fp:
-            fp.extractall(doc_workspace)
-
-        with tarfile.open(nist_summary_data_path) as fp:
-            fp.extractall(tmpdir)
-        
-        sum_workspace = os.path.join(tmpdir, "DUC2002_test_data")
- 
-        print("Writing duc 2002 sds data to {} ...".format(output_directory))
-        extract_sds_data(doc_workspace, sum_workspace, output_directory)
-    
-    finally:
-        shutil.rmtree(tmpdir)
+    # The document tarball holds the documents in a nested tar,
+    # duc2002testdocs.tar, which is read in memory along with the outer one.
+    document_workspace = ArchiveWorkspace.from_tarfile(
+        nist_document_data_path, root="DUC2002_Summarization_Documents",
+        stats=stats)
+    summary_workspace = ArchiveWorkspace.from_tarfile(
+        nist_summary_data_path, root="DUC2002_test_data", stats=stats)
+    return document_workspace, summary_workspace
+
+def preprocess_sds(output_directory, nist_document_data_path=None, 
+                   nist_summary_data_path=None,
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                   cache_path=DEFAULT_CACHE_PATH,
+                   cache_max_size=DEFAULT_MAX_SIZE,
+                   incremental=True, output_format="json",
+                   shard_size=DEFAULT_SHARD_SIZE, compression=None,
+                   lines="document", schema_version=LEGACY_SCHEMA_VERSION,
+                   annotation_profile=DEFAULT_PROFILE,
+                   annotator=DEFAULT_ANNOTATOR, vocab=False, align=False,
+                   writer_threads=DEFAULT_WRITER_THREADS, report_path=None):
+    '''
+    Preprocess DUC 2002 single document summarization data.
+    Gathers documents and multiple 100 word human reference abstracts.
+    If nist_document_data_path is None, fall back to env variable
+    DUC2002_ORIGINAL_DOCS and fail if that is not set.
+    If nist_summary_data_path is None, fall back to env variable
+    DUC2002_ORIGINAL_SUMMARIES and fail if that is not set.
+    Both tarballs are read into memory, with each file kept compressed;
+    nothing but the output and the annotation cache is written to disk.
+    batch_size is the number of paragraphs annotated per batch.
+    workers is the number of processes used to annotate docsets.
+    cache_path is the annotation cache database that is reused across
+    runs, and by preprocess_mds, by default cache.DEFAULT_CACHE_PATH or
+    None for no cache; it is trimmed to cache_max_size bytes.
+    If incremental is True, documents that are up to date in
+    output_directory are not rebuilt.
+    output_format, shard_size, compression, lines and schema_version
+    select the output files written (see build.build_sds).
+    annotation_profile is "full", "tokens+pos" or "tokens-only"; the
+    lighter profiles load fewer spacy components and leave pos and ne out
+    of the output.
+    annotator is "spacy" or "regex"; the regex annotator needs no spacy
+    model and is much faster, but only supports the tokens-only profile.
+    If vocab is True, token and tag frequencies are written alongside the
+    data (see build.build_sds).
+    If align is True, input sentences are aligned with their summaries
+    and oracle extract labels computed (see alignment.align_sds).
+    writer_threads is the number of threads that write the output while
+    later docsets are annotated; only the json format can use several.
+    Returns a BuildStats of the time spent in each stage and the number
+    of documents, sentences, tokens and bytes processed, which is also
+    written to report_path as JSON if it is given.
+    '''
+    check_writer_threads(writer_threads, output_format)
+    stats = BuildStats()
+    document_workspace, summary_workspace = open_releases(
+        nist_document_data_path, nist_summary_data_path, stats=stats)
+
+    logger.info("Writing duc 2002 sds data to %s ...", output_directory)
+    extract_sds_data(
+        document_workspace, summary_workspace, output_directory,
+        batch_size=batch_size, workers=workers, cache_path=cache_path,
+        cache_max_size=cache_max_size, incremental=incremental,
+        output_format=output_format, shard_size=shard_size,
+        compression=compression, lines=lines, schema_version=schema_version,
+        annotation_profile=annotation_profile, annotator=annotator,
+        vocab=vocab, align=align, writer_threads=writer_threads,
+        stats=stats)
+    if report_path is not None:
+        stats.save(report_path)
+    return stats
+
+def preprocess_mds(output_directory, nist_document_data_path=None,
+                   nist_summary_data_path=None,
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1,
+                   cache_path=DEFAULT_CACHE_PATH,
+                   cache_max_size=DEFAULT_MAX_SIZE,
+                   annotation_profile=DEFAULT_PROFILE,
+                   annotator=DEFAULT_ANNOTATOR, sizes=MDS_SIZES,
+                   writer_threads=DEFAULT_WRITER_THREADS, report_path=None):
+    '''
+    Preprocess DUC 2002 multi document summarization data.
+    Gathers the documents of each docset and its 10, 50, 100 and 200
+    word human reference abstracts (those of sizes). Every document is
+    written and annotated once, and the docsets and abstracts refer to
+    it by id (see output.MdsJsonWriter). With the cache_path used for
+    preprocess_sds, by default the same, its annotations of the documents
+    are reused.
+    The other arguments are as for preprocess_sds.
+    '''
+    stats = BuildStats()
+    document_workspace, summary_workspace = open_releases(
+        nist_document_data_path, nist_summary_data_path, stats=stats)
+
+    logger.info("Writing duc 2002 mds data to %s ...", output_directory)
+    extract_mds_data(
+        document_workspace, summary_workspace, output_directory,
+        batch_size=batch_size, workers=workers, cache_path=cache_path,
+        cache_max_size=cache_max_size,
+        annotation_profile=annotation_profile, annotator=annotator,
+        sizes=sizes, writer_threads=writer_threads, stats=stats)
+    if report_path is not None:
+        stats.save(report_path)
+    return stats
@@ -0,0 +1,80 @@
+import os
+import re
+import functools
+import logging
+from ..archive import get_workspace
+from ..build import build_mds
+
+
+logger = logging.getLogger(__name__)
+
+# Word counts of the multi document abstracts, which are also the names
+# of their files in each summary directory. The 200e and 400e files hold
+# extracts rather than abstracts.
+MDS_SIZES = ["10", "50", "100", "200"]
+
+
+def get_mds_summary_files(summary_workspace, sizes=MDS_SIZES):
+    '''
+    Return a dict from docset id to the paths of its multi document
+    summary files of sizes.
+    '''
+
+    summary_dir = os.path.join("summaries", "summaries")
+
+    docset2summary_files = {}
+    for fn in sorted(summary_workspace.listdir(summary_dir)):
+        match = re.search(r"^(d\d+[a-z])[a-z]$", fn)
+        if match is None:
+            continue
+        docset = match.groups()[0]
+        for size in sizes:
+            summary_path = os.path.join(summary_dir, fn, size)
+            if summary_workspace.exists(summary_path):
+                docset2summary_files.setdefault(docset, []).append(
+                    summary_path)
+    logger.info("Found multi document summaries for %d docsets",
+                len(docset2summary_files))
+    return docset2summary_files
+
+def get_mds_docsets(document_workspace, summary_workspace, sizes=MDS_SIZES):
+
+    docset2summary_files = get_mds_summary_files(
+        summary_workspace, sizes=sizes)
+    docset_ids = document_workspace.listdir("docs")
+    for docset_id in docset2summary_files:
+        assert docset_id in docset_ids
+
+    for docset_id in docset_ids:
+        if docset_id not in docset2summary_files:
+            continue
+        logger.debug("Reading docset %s", docset_id)
+        docset_dir = os.path.join("docs", docset_id)
+        input_paths = [os.path.join(docset_dir, fn)
+                       for fn in document_workspace.listdir(docset_dir)]
+        input_files = [(path, document_workspace.read(path))
+                       for path in input_paths]
+        summary_files = [(path, summary_workspace.read(path))
+                         for path in docset2summary_files[docset_id]]
+        yield docset_id, summary_files, input_files
+
+def open_mds_splits(document_release_data_path, summary_release_data_path,
+                    stats, sizes=MDS_SIZES):
+    document_workspace = get_workspace(
+        document_release_data_path, stats=stats)
+    summary_workspace = get_workspace(summary_release_data_path, stats=stats)
+    return [(None, get_mds_docsets(
+        document_workspace, summary_workspace, sizes=sizes))]
+
+def extract_mds_data(document_release_data_path, summary_release_data_path,
+                     output_dir, sizes=MDS_SIZES, **kwargs):
+    '''
+    Write the DUC 2002 multi document data, with the abstracts of sizes,
+    to output_dir. The release data paths are as for
+    sds.extract_sds_data, and the other arguments are as for
+    build.build_mds, which returns stats.
+    '''
+    return build_mds(
+        functools.partial(open_mds_splits, document_release_data_path,
+                          summary_release_data_path, sizes=sizes),
+        output_dir, **kwargs)
@@ -1,100 +1,74 @@
 import os
 import re
-import json
-import argparse
-from . import document_parser
-import spacy
+import functools
+import logging
+from ..archive import get_workspace
+from ..build import build_sds
 
 
-def validate_directory(path):
-    if path != "" and not os.path.exists(path):
-        os.makedirs(path)
+logger = logging.getLogger(__name__)
 
-def get_summaries(eval_root_path, nlp):
 
-    summary_dir = os.path.join(eval_root_path, "summaries", "summaries")
+def get_summary_files(summary_workspace):
+    '''
+    Return a dict from docset id to the paths of the perdocs files that
+    summarize its documents.
+    '''
 
-    id2summaries = {}
+    summary_dir = os.path.join("summaries", "summaries")
 
-    for fn in os.listdir(summary_dir):
+    docset2summary_files = {}
+    for fn in summary_workspace.listdir(summary_dir):
         match = re.search("^(d\d+[a-z])[a-z]$", fn)
         if match is None:
             continue
         docset = match.groups()[0]
-        print(docset, fn)
+        logger.debug("Found summaries %s of docset %s", fn, docset)
         summary_path = os.path.join(summary_dir, fn, "perdocs")
-        if not os.path.exists(summary_path):
+        if not summary_workspace.exists(summary_path):
             continue
-        summaries = document_parser.parse_perdocs_xml(summary_path, nlp)
-        for doc_id, summary in summaries.items():
-            key = (docset, doc_id)
-            if key not in id2summaries:
-                id2summaries[key] = []
-            id2summaries[key].append(summary)
-    for docset_id, doc_id in id2summaries.keys():
-        print("Found {} summaries for doc {} {}".format(
-            len(id2summaries[(docset_id, doc_id)]), docset_id, doc_id))
-    print("Found at least 1 summary for {} docsets".format(len(id2summaries)))
+        if docset not in docset2summary_files:
+            docset2summary_files[docset] = []
+        docset2summary_files[docset].append(summary_path)
+    logger.info("Found at least 1 summary for %d docsets",
+                len(docset2summary_files))
 
-    return id2summaries
+    return docset2summary_files
 
-def get_inputs(release_root_path, nlp):
+def get_docsets(document_workspace, summary_workspace):
 
-    docset_ids = os.listdir(os.path.join(release_root_path, "docs"))
+    docset2summary_files = get_summary_files(summary_workspace)
+    docset_ids = document_workspace.listdir("docs")
+    for docset_id in docset2summary_files:
+        assert docset_id in docset_ids
 
-    id2input_data = {}
     for docset_id in docset_ids:
-        print(docset_id)
-        docset_dir = os.path.join(release_root_path, "docs", docset_id)
+        logger.debug("Reading docset %s", docset_id)
+        docset_dir = os.path.join("docs", docset_id)
         input_paths = [os.path.join(docset_dir, fn)
-                       for fn in os.listdir(docset_dir)]
-        docs = document_parser.parse_input_docs(input_paths, nlp)
-        for doc in docs:
-            input_data = []
-            for s, sentence in enumerate(doc["sentences"], 1):
-                input_data.append({
-                    "docset_id": docset_id,
-                    "doc_id": doc["doc_id"],
-                    "date": str(doc["date"]),
-                    "sentence_id": s,
-                    "text": sentence["text"],
-                    "pos": sentence["pos"],
-                    "ne": sentence["ne"],
-                    "tokens": sentence["tokens"]})
-
-            id2input_data[(docset_id, doc["doc_id"])] = input_data
-
-    return id2input_data
+                       for fn in document_workspace.listdir(docset_dir)]
+        input_files = [(path, document_workspace.read(path))
+                       for path in input_paths]
+        summary_files = [(path, summary_workspace.read(path), False)
+                         for path in docset2summary_files.get(docset_id, [])]
+        yield docset_id, summary_files, input_files
+
+def open_sds_splits(document_release_data_path, summary_release_data_path,
+                    stats):
+    document_workspace = get_workspace(
+        document_release_data_path, stats=stats)
+    summary_workspace = get_workspace(summary_release_data_path, stats=stats)
+    return [(None, get_docsets(document_workspace, summary_workspace))]
 
 def extract_sds_data(document_release_data_path, summary_release_data_path,
-                     output_dir, nlp=None):
-    if nlp is None:
-        nlp = spacy.load('en', parser=False)
-
-    summary_dir = os.path.join(output_dir, "targets")
-    validate_directory(summary_dir)
-    inputs_dir = os.path.join(output_dir, "inputs")
-    validate_directory(inputs_dir)
-
-    id2summaries = get_summaries(summary_release_data_path, nlp)
-    id2inputs = get_inputs(document_release_data_path, nlp)
-
-    for id, summaries in id2summaries.items():
-        for summary in summaries:
-            summary["docset_id"] = id[0]
-        print(id)
-        docset_id, doc_id = id
-        assert id in id2inputs
-        input_data = id2inputs[id]
-        input_path = os.path.join(
-            inputs_dir, "{}.{}.input.json".format(docset_id, doc_id))
-
-        print("Writing input data {} ...".format(input_path))
-        with open(input_path, "w") as fp:
-            fp.write(json.dumps(input_data))
-
-        summary_path = os.path.join(
-            summary_dir, "{}.{}.target.json".format(docset_id, doc_id))
-        print("Writing target data {} ...".format(summary_path))
-        with open(summary_path, "w") as fp:
-            fp.write(json.dumps(summaries))
+                     output_dir, **kwargs):
+    '''
+    Write the DUC 2002 single document data to output_dir.
+    The release data paths are either paths to extracted release
+    directories or ArchiveWorkspaces of the release tarballs.
+    The other arguments are as for build.build_sds, which returns stats.
+    '''
+    return build_sds(
+        functools.partial(open_sds_splits, document_release_data_path,
+                          summary_release_data_path),
+        output_dir, **kwargs)
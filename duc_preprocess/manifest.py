@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+
+
+def hash_text(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def hash_file(path):
+    with open(path, "rb") as fp:
+        return hashlib.sha1(fp.read()).hexdigest()
+
+class BuildManifest(object):
+    '''
+    Records how each (docset_id, doc_id) in an output directory was built:
+    the hashes of the release files it was read from, the parser version
+    and the hashes of the files that were written for it.
+    Records are appended to output_dir/manifest.jsonl as soon as a
+    document is written, so an interrupted build can resume where it
+    stopped. The file is compacted to one record per document on close.
+    '''
+
+    def __init__(self, output_dir, parser_version):
+        self.output_dir = output_dir
+        self.parser_version = parser_version
+        self.path = os.path.join(output_dir, "manifest.jsonl")
+        self.records = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as fp:
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partial last line from an interrupted build.
+                        continue
+                    key = (record["docset_id"], record["doc_id"])
+                    self.records[key] = record
+        self.fp = open(self.path, "a")
+
+    def is_complete(self, docset_id, doc_id, input_hashes):
+        '''
+        True if the document was built by this parser version from files
+        with input_hashes and its outputs are unchanged on disk.
+        '''
+        record = self.records.get((docset_id, doc_id))
+        if record is None:
+            return False
+        if record["parser_version"] != self.parser_version:
+            return False
+        if record["inputs"] != input_hashes:
+            return False
+        for path, output_hash in record["outputs"].items():
+            full_path = os.path.join(self.output_dir, path)
+            if not os.path.exists(full_path):
+                return False
+            if hash_file(full_path) != output_hash:
+                return False
+        return True
+
+    def add(self, docset_id, doc_id, input_hashes, output_hashes):
+        '''
+        Record a written document. output_hashes maps output file paths,
+        relative to output_dir, to the hash of their contents.
+        '''
+        record = {"docset_id": docset_id, "doc_id": doc_id,
+                  "parser_version": self.parser_version,
+                  "inputs": input_hashes, "outputs": output_hashes}
+        self.records[(docset_id, doc_id)] = record
+        self.fp.write(json.dumps(record, sort_keys=True) + "\n")
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as fp:
+            for key in sorted(self.records):
+                fp.write(json.dumps(self.records[key], sort_keys=True) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
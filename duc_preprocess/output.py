@@ -0,0 +1,383 @@
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import threading
+from .manifest import hash_text
+from .stats import BuildStats
+from .arrays import ArrayWriter, TAG_FIELDS
+from .schema import (
+    make_input_data, make_target_data, check_schema_version,
+    LEGACY_SCHEMA_VERSION)
+
+
+DEFAULT_SHARD_SIZE = 1000
+DEFAULT_WRITER_THREADS = 1
+DEFAULT_WRITE_QUEUE_SIZE = 64
+OUTPUT_FORMATS = ["json", "jsonl", "array"]
+# The output formats that write each document to its own file, so that
+# several threads can write them (see AsyncWriter).
+CONCURRENT_FORMATS = ["json"]
+COMPRESSIONS = [None, "gzip", "zstd"]
+LINE_TYPES = ["document", "sentence"]
+SHARD_EXTENSIONS = {
+    None: ".jsonl", "gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+logger = logging.getLogger(__name__)
+
+def check_writer_threads(writer_threads, output_format="json"):
+    if writer_threads < 0:
+        raise ValueError("writer_threads cannot be negative.")
+    if writer_threads > 1 and output_format not in CONCURRENT_FORMATS:
+        raise ValueError(
+            "The {} output format can only be written by one "
+            "thread.".format(output_format))
+
+def validate_directory(path):
+    if path != "" and not os.path.exists(path):
+        os.makedirs(path)
+
+class JsonWriter(object):
+    '''
+    Writes each document to its own pair of files: its input data to
+    output_dir/inputs/{docset_id}.{doc_id}.input.json and its target
+    data to output_dir/targets/{docset_id}.{doc_id}.target.json, in
+    schema_version (see schema.py).
+    Serializing and writing are timed in stats, as are those of the other
+    writers.
+    Every document goes to its own files, so documents can be written
+    concurrently by several threads (see AsyncWriter).
+    '''
+
+    incremental = True
+    concurrent = True
+
+    def __init__(self, output_dir, schema_version=LEGACY_SCHEMA_VERSION,
+                 stats=None):
+        check_schema_version(schema_version)
+        self.output_dir = output_dir
+        self.schema_version = schema_version
+        self.stats = stats if stats is not None else BuildStats()
+        validate_directory(os.path.join(output_dir, "inputs"))
+        validate_directory(os.path.join(output_dir, "targets"))
+
+    def write_json(self, path, data):
+        with self.stats.timer("serialize"):
+            text = json.dumps(data)
+        logger.debug("Writing %s", os.path.join(self.output_dir, path))
+        with self.stats.timer("write"):
+            with open(os.path.join(self.output_dir, path), "w") as fp:
+                fp.write(text)
+        # json.dumps escapes non ascii characters, so this is the size in
+        # bytes.
+        self.stats.count("bytes_written", len(text))
+        return hash_text(text)
+
+    def write(self, docset_id, doc_id, doc, summaries):
+        '''
+        Write an annotated document and its summaries and return a dict
+        from the paths written, relative to output_dir, to the hash of
+        their contents.
+        '''
+        input_path = os.path.join(
+            "inputs", "{}.{}.input.json".format(docset_id, doc_id))
+        target_path = os.path.join(
+            "targets", "{}.{}.target.json".format(docset_id, doc_id))
+        with self.stats.timer("serialize"):
+            input_data = make_input_data(
+                docset_id, doc, schema_version=self.schema_version)
+            target_data = make_target_data(
+                docset_id, doc_id, summaries,
+                schema_version=self.schema_version)
+        return {input_path: self.write_json(input_path, input_data),
+                target_path: self.write_json(target_path, target_data)}
+
+    def close(self):
+        pass
+
+class MdsJsonWriter(JsonWriter):
+    '''
+    Writes multi document data: each input document once, to
+    output_dir/documents/{doc_id}.json as the input data of the single
+    document output in the legacy schema, the ids of each docset's
+    documents to output_dir/inputs/{docset_id}.input.json and its
+    summaries of every size, which refer to the documents by id in their
+    "input_ids", to output_dir/targets/{docset_id}.target.json.
+    '''
+
+    incremental = False
+
+    def __init__(self, output_dir, stats=None):
+        JsonWriter.__init__(self, output_dir, stats=stats)
+        validate_directory(os.path.join(output_dir, "documents"))
+
+    def write(self, docset_id, documents, summaries):
+        for doc in documents:
+            with self.stats.timer("serialize"):
+                input_data = make_input_data(docset_id, doc)
+            self.write_json(os.path.join(
+                "documents", "{}.json".format(doc["doc_id"])), input_data)
+        doc_ids = sorted(doc["doc_id"] for doc in documents)
+        self.write_json(
+            os.path.join("inputs", "{}.input.json".format(docset_id)),
+            {"docset_id": docset_id, "doc_ids": doc_ids})
+        summaries = sorted(summaries, key=lambda summary: (
+            summary["size"], summary["selector"], summary["summarizer"]))
+        self.write_json(
+            os.path.join("targets", "{}.target.json".format(docset_id)),
+            summaries)
+        return {}
+
+def open_shard(path, compression=None):
+    if compression is None:
+        return open(path, "wb")
+    elif compression == "gzip":
+        return gzip.open(path, "wb")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "zstd compression requires the zstandard package.")
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    else:
+        raise Exception("Unknown compression: {}".format(compression))
+
+class ShardStream(object):
+    '''
+    Writes JSON lines to a series of shard files in directory, starting a
+    new shard every shard_size documents.
+    '''
+
+    def __init__(self, output_dir, directory, shard_size, compression,
+                 stats=None):
+        self.output_dir = output_dir
+        self.stats = stats if stats is not None else BuildStats()
+        self.directory = directory
+        self.shard_size = shard_size
+        self.compression = compression
+        self.shard_id = -1
+        self.fp = None
+        self.documents = 0
+
+    def next_shard(self):
+        if self.fp is not None:
+            self.fp.close()
+        self.shard_id += 1
+        self.shard_path = os.path.join(
+            self.directory, "part-{:05d}{}".format(
+                self.shard_id, SHARD_EXTENSIONS[self.compression]))
+        logger.info(
+            "Writing %s", os.path.join(self.output_dir, self.shard_path))
+        self.fp = open_shard(
+            os.path.join(self.output_dir, self.shard_path), self.compression)
+        self.offset = 0
+        self.line = 0
+        self.documents = 0
+
+    def write(self, records):
+        '''
+        Write records, one JSON line each, for one document and return
+        their location: the shard path, the line number and (uncompressed)
+        byte offset of the first line and the number of lines and bytes.
+        '''
+        if self.fp is None or self.documents == self.shard_size:
+            self.next_shard()
+        with self.stats.timer("serialize"):
+            data = "".join(
+                json.dumps(record) + "\n"
+                for record in records).encode("utf-8")
+        with self.stats.timer("write"):
+            self.fp.write(data)
+        self.stats.count("bytes_written", len(data))
+        location = {"shard": self.shard_path, "line": self.line,
+                    "lines": len(records), "offset": self.offset,
+                    "length": len(data)}
+        self.line += len(records)
+        self.offset += len(data)
+        self.documents += 1
+        return location
+
+    def close(self):
+        if self.fp is not None:
+            with self.stats.timer("write"):
+                self.fp.close()
+            self.fp = None
+
+class ShardedJsonlWriter(object):
+    '''
+    Writes documents to sharded JSON Lines files,
+    output_dir/inputs/part-NNNNN.jsonl and
+    output_dir/targets/part-NNNNN.jsonl, with shard_size documents per
+    shard and optional gzip or zstd compression (zstd needs the
+    zstandard package).
+    If lines is "document", each document is one line in each stream
+    holding the same data, in schema_version, as the per document JSON
+    files. If lines is "sentence", every input sentence record and every
+    summary is its own line; this needs the legacy schema, whose records
+    carry their document ids.
+    output_dir/index.jsonl locates each document's lines (see
+    ShardStream.write). Shards are always rewritten from scratch, so
+    writing shards is not incremental.
+    '''
+
+    incremental = False
+    concurrent = False
+
+    def __init__(self, output_dir, shard_size=DEFAULT_SHARD_SIZE,
+                 compression=None, lines="document",
+                 schema_version=LEGACY_SCHEMA_VERSION, stats=None):
+        check_schema_version(schema_version)
+        if compression not in COMPRESSIONS:
+            raise Exception("Unknown compression: {}".format(compression))
+        if lines not in LINE_TYPES:
+            raise Exception("Unknown line type: {}".format(lines))
+        if lines == "sentence" and schema_version != LEGACY_SCHEMA_VERSION:
+            raise Exception(
+                "lines=\"sentence\" needs schema version {}.".format(
+                    LEGACY_SCHEMA_VERSION))
+        assert shard_size > 0
+        self.output_dir = output_dir
+        self.lines = lines
+        self.schema_version = schema_version
+        self.stats = stats if stats is not None else BuildStats()
+        for directory in ["inputs", "targets"]:
+            validate_directory(os.path.join(output_dir, directory))
+            for fn in os.listdir(os.path.join(output_dir, directory)):
+                if re.search(r"^part-\d+\.jsonl", fn):
+                    os.remove(os.path.join(output_dir, directory, fn))
+        self.inputs = ShardStream(
+            output_dir, "inputs", shard_size, compression, stats=self.stats)
+        self.targets = ShardStream(
+            output_dir, "targets", shard_size, compression, stats=self.stats)
+        self.index_fp = open(os.path.join(output_dir, "index.jsonl"), "w")
+
+    def write(self, docset_id, doc_id, doc, summaries):
+        with self.stats.timer("serialize"):
+            input_data = make_input_data(
+                docset_id, doc, schema_version=self.schema_version)
+            summaries = make_target_data(
+                docset_id, doc_id, summaries,
+                schema_version=self.schema_version)
+        if self.lines == "document":
+            input_records = [input_data]
+            target_records = [summaries]
+        else:
+            input_records = input_data
+            target_records = summaries
+        index = {"docset_id": docset_id, "doc_id": doc_id,
+                 "inputs": self.inputs.write(input_records),
+                 "targets": self.targets.write(target_records)}
+        with self.stats.timer("write"):
+            self.index_fp.write(json.dumps(index, sort_keys=True) + "\n")
+        return {}
+
+    def close(self):
+        self.inputs.close()
+        self.targets.close()
+        self.index_fp.close()
+
+class AsyncWriter(object):
+    '''
+    Passes the documents given to write on to writer from threads
+    background threads, through a queue of at most queue_size documents,
+    so that serializing and writing the output overlaps with reading and
+    annotating the docsets after them. If threads is 0, documents are
+    written as they are given. Only writers whose documents go to their
+    own files (concurrent writers) can have more than one thread; with
+    one, documents are written in order.
+    write blocks while the queue is full, when writing is slower than the
+    rest of the build; that time is the "write_wait" stage of stats.
+    An error in a writer thread is raised by the next write or by close,
+    which writes the queued documents and closes writer.
+    '''
+
+    def __init__(self, writer, threads=DEFAULT_WRITER_THREADS,
+                 queue_size=DEFAULT_WRITE_QUEUE_SIZE, stats=None):
+        if threads > 1 and not writer.concurrent:
+            raise Exception(
+                "{} can only be written by one thread.".format(
+                    type(writer).__name__))
+        assert queue_size > 0
+        self.writer = writer
+        self.stats = stats if stats is not None else BuildStats()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.error = None
+        self.raised = False
+        self.threads = [
+            threading.Thread(target=self.run, name="writer-{}".format(i))
+            for i in range(threads)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            args, done = item
+            # After an error the queue is still drained, so that write
+            # and close do not block.
+            if self.error is not None:
+                continue
+            try:
+                output_hashes = self.writer.write(*args)
+                if done is not None:
+                    with self.lock:
+                        done(output_hashes)
+            except Exception as e:
+                logger.error("Writer thread failed: %s", e)
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+
+    def check(self):
+        if self.error is not None and not self.raised:
+            self.raised = True
+            raise self.error
+
+    def write(self, args, done=None):
+        '''
+        Write a document with writer.write(*args) and call done, if given,
+        with the dict of output hashes it returns once it is written.
+        '''
+        self.check()
+        if len(self.threads) == 0:
+            output_hashes = self.writer.write(*args)
+            if done is not None:
+                done(output_hashes)
+            return
+        try:
+            self.queue.put_nowait((args, done))
+        except queue.Full:
+            with self.stats.timer("write_wait"):
+                self.queue.put((args, done))
+
+    def close(self):
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.writer.close()
+        self.check()
+
+def make_writer(output_dir, output_format="json",
+                shard_size=DEFAULT_SHARD_SIZE, compression=None,
+                lines="document", schema_version=LEGACY_SCHEMA_VERSION,
+                fields=TAG_FIELDS, stats=None):
+    if output_format == "json":
+        return JsonWriter(
+            output_dir, schema_version=schema_version, stats=stats)
+    elif output_format == "jsonl":
+        return ShardedJsonlWriter(
+            output_dir, shard_size=shard_size, compression=compression,
+            lines=lines, schema_version=schema_version, stats=stats)
+    elif output_format == "array":
+        return ArrayWriter(output_dir, fields=fields, stats=stats)
+    else:
+        raise Exception("Unknown output format: {}".format(output_format))
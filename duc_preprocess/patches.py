@@ -0,0 +1,33 @@
+import re
+
+
+def apply_patches(patches, text):
+    '''
+    Apply a list of patches to the contents of a release file and return
+    the patched text, or None if the file should be treated as missing.
+    Each patch is a tuple whose first item names the operation:
+
+        ("sub", pattern, replacement, flags) -- re.sub over the text.
+        ("append_missing", suffix) -- append suffix unless it occurs.
+        ("remove",) -- drop the file from the release.
+
+    Patches are idempotent, so they are safe to apply to files that were
+    already repaired.
+    '''
+    for patch in patches:
+        operation = patch[0]
+        if operation == "remove":
+            return None
+        elif operation == "sub":
+            _, pattern, replacement, flags = patch
+            text = re.sub(pattern, replacement, text, flags=flags)
+        elif operation == "append_missing":
+            suffix = patch[1]
+            if suffix not in text:
+                text = "{}{}".format(text, suffix)
+        else:
+            raise Exception("Unknown patch operation: {}".format(operation))
+    return text
+
+def is_removed(patches):
+    return any(patch[0] == "remove" for patch in patches)
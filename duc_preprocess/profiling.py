@@ -0,0 +1,161 @@
+import os
+import time
+import signal
+import cProfile
+import logging
+import pstats
+import threading
+import collections
+from .document_parser import read_perdocs_xml, read_mds_xml
+from .sources import SOURCE_PARSERS
+from .stats import BuildStats, get_active_stage, STAGES
+
+
+logger = logging.getLogger(__name__)
+
+# "cprofile" writes a pstats file (see the pstats module or snakeviz),
+# "sample" a collapsed stack file (see flamegraph.pl or speedscope).
+PROFILERS = ["cprofile", "sample"]
+DEFAULT_PROFILE_OUTPUTS = {"cprofile": "profile.pstats",
+                           "sample": "profile.folded"}
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+def get_parser_functions():
+    '''
+    Return the functions parsing release files, keyed by name: the
+    registered source parsers and the summary readers.
+    '''
+    functions = [read_perdocs_xml, read_mds_xml]
+    functions.extend(SOURCE_PARSERS.values())
+    return {function.__name__: function for function in functions}
+
+def format_code(code):
+    return "{}:{}".format(os.path.basename(code.co_filename), code.co_name)
+
+class StackSampler(object):
+    '''
+    Sample the stack of the main thread every interval seconds of wall
+    time, along with the stage it is timing (see stats.BuildStats.timer).
+    Much cheaper than cProfile on long builds, at the cost of missing
+    short calls. Samples are taken in a SIGALRM handler rather than from
+    another thread, which would only get the GIL when the main thread
+    blocks on I/O, so this only works in the main thread on Unix.
+    '''
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = collections.Counter()
+        self.previous_handler = None
+
+    def start(self):
+        if threading.current_thread() is not threading.main_thread():
+            raise Exception("The sampler only runs in the main thread.")
+        self.previous_handler = signal.signal(signal.SIGALRM, self.sample)
+        signal.setitimer(signal.ITIMER_REAL, self.interval, self.interval)
+
+    def sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        stack.reverse()
+        stage = get_active_stage(threading.get_ident())
+        self.samples[(stage, tuple(stack))] += 1
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous_handler)
+
+    def save(self, path):
+        '''
+        Write the samples as collapsed stacks, one "frame;frame;... count"
+        line per distinct stack, rooted at the stage, e.g. "[parse]".
+        '''
+        lines = collections.Counter()
+        for (stage, stack), n in self.samples.items():
+            frames = ["[{}]".format(stage or "other")]
+            frames.extend(format_code(code) for code in stack)
+            lines[";".join(frames)] += n
+        with open(path, "w") as fp:
+            for line, n in sorted(lines.items()):
+                fp.write("{} {}\n".format(line, n))
+
+    def get_breakdown(self):
+        '''
+        Return the sampled seconds spent in each stage and in each parser
+        function (see get_parser_functions), including their callees.
+        '''
+        parser_codes = {function.__code__: name for name, function
+                        in get_parser_functions().items()}
+        stages = collections.Counter()
+        parsers = collections.Counter()
+        for (stage, stack), n in self.samples.items():
+            stages[stage or "other"] += n * self.interval
+            for name in set(parser_codes[code] for code in stack
+                            if code in parser_codes):
+                parsers[name] += n * self.interval
+        return stages, parsers
+
+def get_cprofile_breakdown(profile, result):
+    '''
+    Return the seconds spent in each stage, taken from result if it is a
+    BuildStats since cProfile cannot see stages, and the cumulative
+    seconds of each parser function (see get_parser_functions).
+    '''
+    stages = collections.Counter()
+    if isinstance(result, BuildStats):
+        stages.update(result.seconds)
+    function_stats = pstats.Stats(profile).stats
+    parsers = collections.Counter()
+    for name, function in get_parser_functions().items():
+        code = function.__code__
+        key = (code.co_filename, code.co_firstlineno, code.co_name)
+        if key in function_stats:
+            parsers[name] += function_stats[key][3]
+    return stages, parsers
+
+def format_breakdown(stages, parsers):
+    lines = ["Stages: " + ", ".join(
+                 "{} {:.2f}s".format(stage, stages[stage])
+                 for stage in STAGES + ["other"] if stages[stage] > 0),
+             "Parsers: " + ", ".join(
+                 "{} {:.2f}s".format(name, seconds)
+                 for name, seconds in parsers.most_common())]
+    return "\n".join(lines)
+
+def profile_call(profiler, output_path, func, *args, **kwargs):
+    '''
+    Call func(*args, **kwargs) and return its result. If profiler is
+    "cprofile" or "sample" the call is profiled, the profile is written
+    to output_path (DEFAULT_PROFILE_OUTPUTS[profiler] if None) and the
+    time spent in each stage and source parser is logged.
+    Only this process is profiled, so with several workers annotation
+    is missing from the profile.
+    '''
+    if profiler is None:
+        return func(*args, **kwargs)
+    if profiler not in PROFILERS:
+        raise Exception("Unknown profiler: {}".format(profiler))
+    if output_path is None:
+        output_path = DEFAULT_PROFILE_OUTPUTS[profiler]
+
+    start = time.time()
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+        result = profile.runcall(func, *args, **kwargs)
+        profile.dump_stats(output_path)
+        stages, parsers = get_cprofile_breakdown(profile, result)
+    else:
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            sampler.stop()
+        sampler.save(output_path)
+        stages, parsers = sampler.get_breakdown()
+
+    logger.info("Profiled %.2fs with %s, written to %s",
+                time.time() - start, profiler, output_path)
+    logger.info(format_breakdown(stages, parsers))
+    return result
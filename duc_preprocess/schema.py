@@ -0,0 +1,165 @@
+import json
+from .spans import expand_sentences, encode_token_spans, decode_token_spans
+
+
+# Version 1 is the original output: a list of sentence records that each
+# repeat docset_id, doc_id and date, and a list of summaries that each
+# repeat docset_id. Version 2 stores the document level fields once per
+# document. Version 3 is version 2 in the span representation (see
+# spans.py): the text of each document and summary is stored once, and
+# its sentences hold offsets into it instead of their text and tokens.
+LEGACY_SCHEMA_VERSION = 1
+SPAN_SCHEMA_VERSION = 3
+SCHEMA_VERSIONS = [1, 2, 3]
+
+def check_schema_version(schema_version):
+    if schema_version not in SCHEMA_VERSIONS:
+        raise Exception("Unknown schema version: {}".format(schema_version))
+
+def make_sentence_record(sentence_id, sentence, record=None):
+    '''
+    Add the fields of an annotated sentence to record in output order.
+    pos and ne are left out if the annotation profile did not produce
+    them.
+    '''
+    if record is None:
+        record = {}
+    record["sentence_id"] = sentence_id
+    record["text"] = sentence["text"]
+    for field in ["pos", "ne"]:
+        if field in sentence:
+            record[field] = sentence[field]
+    record["tokens"] = sentence["tokens"]
+    return record
+
+def make_span_record(sentence_id, sentence):
+    record = {"sentence_id": sentence_id,
+              "start": sentence["start"],
+              "end": sentence["end"]}
+    for field in ["pos", "ne"]:
+        if field in sentence:
+            record[field] = sentence[field]
+    record["token_spans"] = encode_token_spans(sentence)
+    return record
+
+def decode_span_record(record):
+    '''
+    Return a span record, as made by make_span_record, as a span
+    sentence.
+    '''
+    sentence = dict(record)
+    sentence["token_starts"], sentence["token_ends"] = decode_token_spans(
+        record["start"], sentence.pop("token_spans"))
+    return sentence
+
+def make_input_data(docset_id, doc, schema_version=LEGACY_SCHEMA_VERSION):
+    '''
+    Make the input data of an annotated document in schema_version.
+    '''
+    check_schema_version(schema_version)
+    datestr = str(doc["date"])
+    if schema_version == 1:
+        input_data = []
+        for s, sentence in enumerate(doc["sentences"], 1):
+            record = {"docset_id": docset_id,
+                      "doc_id": doc["doc_id"],
+                      "date": datestr}
+            input_data.append(make_sentence_record(s, sentence, record))
+        return input_data
+
+    if schema_version == SPAN_SCHEMA_VERSION:
+        sentences = [make_span_record(s, sentence)
+                     for s, sentence in enumerate(doc["sentences"], 1)]
+        return {"schema_version": schema_version,
+                "docset_id": docset_id,
+                "doc_id": doc["doc_id"],
+                "date": datestr,
+                "text": doc["text"],
+                "sentences": sentences}
+
+    sentences = [make_sentence_record(s, sentence)
+                 for s, sentence in enumerate(doc["sentences"], 1)]
+    return {"schema_version": schema_version,
+            "docset_id": docset_id,
+            "doc_id": doc["doc_id"],
+            "date": datestr,
+            "sentences": sentences}
+
+def make_target_data(docset_id, doc_id, summaries,
+                     schema_version=LEGACY_SCHEMA_VERSION):
+    '''
+    Make the target data of a document's annotated summaries, which
+    carry their docset_id, in schema_version.
+    '''
+    check_schema_version(schema_version)
+    if schema_version == 1:
+        # The sentences may be in a SentenceBlock (see sentences.py).
+        return [dict(summary, sentences=list(summary["sentences"]))
+                for summary in summaries]
+    target_summaries = []
+    for summary in summaries:
+        summary = {key: value for key, value in summary.items()
+                   if key != "docset_id"}
+        if schema_version == SPAN_SCHEMA_VERSION:
+            summary["sentences"] = [
+                make_span_record(s, sentence)
+                for s, sentence in enumerate(summary["sentences"], 1)]
+        else:
+            summary["sentences"] = list(summary["sentences"])
+        target_summaries.append(summary)
+    return {"schema_version": schema_version,
+            "docset_id": docset_id,
+            "doc_id": doc_id,
+            "summaries": target_summaries}
+
+def expand_input_data(data):
+    '''
+    Return input data of any schema version in the legacy (version 1)
+    shape, a list of sentence records.
+    '''
+    if isinstance(data, list):
+        return data
+    check_schema_version(data["schema_version"])
+    sentences = data["sentences"]
+    if data["schema_version"] == SPAN_SCHEMA_VERSION:
+        sentences = [decode_span_record(record) for record in sentences]
+        sentences = [
+            dict(expanded, sentence_id=sentence["sentence_id"])
+            for sentence, expanded in zip(
+                sentences, expand_sentences(data["text"], sentences))]
+    input_data = []
+    for sentence in sentences:
+        record = {"docset_id": data["docset_id"],
+                  "doc_id": data["doc_id"],
+                  "date": data["date"]}
+        input_data.append(make_sentence_record(
+            sentence["sentence_id"], sentence, record))
+    return input_data
+
+def expand_target_data(data):
+    '''
+    Return target data of any schema version in the legacy (version 1)
+    shape, a list of summaries.
+    '''
+    if isinstance(data, list):
+        return data
+    check_schema_version(data["schema_version"])
+    summaries = []
+    for summary in data["summaries"]:
+        summary = dict(summary)
+        if data["schema_version"] == SPAN_SCHEMA_VERSION:
+            summary["sentences"] = expand_sentences(
+                summary.pop("text"),
+                [decode_span_record(record)
+                 for record in summary["sentences"]])
+        summary["docset_id"] = data["docset_id"]
+        summaries.append(summary)
+    return summaries
+
+def load_input_json(path):
+    with open(path, "r") as fp:
+        return expand_input_data(json.loads(fp.read()))
+
+def load_target_json(path):
+    with open(path, "r") as fp:
+        return expand_target_data(json.loads(fp.read()))
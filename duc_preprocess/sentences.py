@@ -0,0 +1,95 @@
+import array
+import sys
+
+
+SENTENCE_TAGS = ["pos", "ne"]
+
+def intern_strings(strings):
+    return [sys.intern(string) for string in strings]
+
+class SentenceBlock(object):
+    '''
+    The annotated sentences of one document or summary stored by column
+    instead of as a dict per sentence: the text of each sentence, the
+    tokens of all of them in one list with the number in each sentence,
+    and pos and ne tags as arrays of ids into tables of the distinct tags
+    of the block. Token and tag strings are interned, so each distinct
+    one is held once in a process however many sentences use it, and the
+    block pickles compactly between worker processes.
+    Iterating yields the sentences as the dicts the annotators produce,
+    so blocks can be written by the output writers as they are.
+    '''
+
+    __slots__ = ["texts", "lengths", "tokens", "tags", "tag_ids"]
+
+    def __init__(self, texts, lengths, tokens, tags, tag_ids):
+        self.texts = texts
+        self.lengths = lengths
+        self.tokens = tokens
+        self.tags = tags
+        self.tag_ids = tag_ids
+
+    @staticmethod
+    def from_sentences(sentences):
+        '''
+        Make a block of a list of annotated sentence dicts with text,
+        tokens and the tag fields of the annotation profile.
+        '''
+        fields = [field for field in SENTENCE_TAGS
+                  if len(sentences) > 0 and field in sentences[0]]
+        tags = {}
+        tag_ids = {}
+        for field in fields:
+            table = {}
+            tag_ids[field] = array.array("H", [
+                table.setdefault(tag, len(table))
+                for sentence in sentences for tag in sentence[field]])
+            tags[field] = intern_strings(sorted(table, key=table.get))
+        return SentenceBlock(
+            [sentence["text"] for sentence in sentences],
+            array.array("I", [
+                len(sentence["tokens"]) for sentence in sentences]),
+            intern_strings(
+                token for sentence in sentences
+                for token in sentence["tokens"]),
+            tags, tag_ids)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        start = 0
+        for text, length in zip(self.texts, self.lengths):
+            end = start + length
+            sentence = {"tokens": self.tokens[start:end], "text": text}
+            for field in SENTENCE_TAGS:
+                if field in self.tag_ids:
+                    tags = self.tags[field]
+                    sentence[field] = [
+                        tags[tag_id]
+                        for tag_id in self.tag_ids[field][start:end]]
+            yield sentence
+            start = end
+
+    def __getstate__(self):
+        return (self.texts, self.lengths, self.tokens, self.tags,
+                self.tag_ids)
+
+    def __setstate__(self, state):
+        self.texts, self.lengths, tokens, tags, self.tag_ids = state
+        self.tokens = intern_strings(tokens)
+        self.tags = {field: intern_strings(field_tags)
+                     for field, field_tags in tags.items()}
+
+def compact_document(document):
+    '''
+    Return an annotated document or summary dict with its sentences in a
+    SentenceBlock. Span sentences (see spans.py) are left as they are.
+    '''
+    if "text" in document or isinstance(
+            document["sentences"], SentenceBlock):
+        return document
+    compacted = dict(document)
+    compacted["sentences"] = SentenceBlock.from_sentences(
+        document["sentences"])
+    return compacted
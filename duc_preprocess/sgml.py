@@ -0,0 +1,65 @@
+import re
+
+
+# Opening and closing tags with upper case names, as used by the TREC
+# document files and the DUC summary files. Opening tags may have
+# attributes, e.g. <SUM TYPE="PERDOC" ...>.
+TAG_PATTERN = re.compile(
+    r"<(?:/([A-Z][A-Z0-9]*)|([A-Z][A-Z0-9]*)(\s[^<>]*)?)>")
+
+def scan_tags(text):
+    '''
+    Split text into a dict from tag name to the list of its opening tags
+    in one pass. Each opening tag is a (start, end, attributes) tuple
+    where text[start:end] is the tag's content, up to the next closing
+    tag of the same name, and attributes is the text between the tag
+    name and ">". Like re.findall(r"<TAG>(.*?)</TAG>", text, re.DOTALL),
+    an opening tag inside the content of another tag of the same name
+    does not start a new span; it, and any opening tag that is never
+    closed, has end None.
+    '''
+    tags = {}
+    open_tags = {}
+    for match in TAG_PATTERN.finditer(text):
+        closing_name, name, attributes = match.groups()
+        if name is not None:
+            spans = tags.setdefault(name, [])
+            if name not in open_tags:
+                open_tags[name] = len(spans)
+            spans.append((match.end(), None, attributes or ""))
+        elif closing_name in open_tags:
+            spans = tags[closing_name]
+            index = open_tags.pop(closing_name)
+            start, _, attributes = spans[index]
+            spans[index] = (start, match.start(), attributes)
+    return tags
+
+def get_spans(tags, name):
+    return [(start, end, attributes)
+            for start, end, attributes in tags.get(name, [])
+            if end is not None]
+
+def get_texts(text, tags, name):
+    '''
+    Return the content of every closed name tag, in order.
+    '''
+    return [text[start:end] for start, end, _ in get_spans(tags, name)]
+
+def get_text(text, tags, name):
+    '''
+    Return the content of the first closed name tag or None.
+    '''
+    for start, end, _ in get_spans(tags, name):
+        return text[start:end]
+    return None
+
+def match_tag(text, tags, name, pattern):
+    '''
+    Return the match of the compiled pattern against the whole content of
+    the first closed name tag it matches, or None.
+    '''
+    for start, end, _ in get_spans(tags, name):
+        match = pattern.fullmatch(text, start, end)
+        if match is not None:
+            return match
+    return None
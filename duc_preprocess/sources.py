@@ -0,0 +1,243 @@
+import re
+import datetime
+from .sgml import scan_tags, get_spans, get_text, get_texts, match_tag
+
+
+# Patterns matched against the content of a single tag (see
+# sgml.match_tag).
+AP_DOCNO = re.compile(r"\s*(AP(\d\d)(\d\d)(\d\d)-\d+)\s*")
+WSJ_DOCNO = re.compile(r"\s*(WSJ(\d\d)(\d\d)(\d\d)-\d+)\s*")
+LA_DOCNO = re.compile(r"\s*(LA(\d\d)(\d\d)(\d\d)-\d+)\s*")
+FT_DOCNO = re.compile(r"\s*(FT.*?)\s*", flags=re.DOTALL)
+FBIS_DOCNO = re.compile(r"\s*(FBIS.*?)\s*", flags=re.DOTALL)
+SJMN_DOCNO = re.compile(r"\s*(.*?)\s*", flags=re.DOTALL)
+YYMMDD_DATE = re.compile(r"\s*(\d\d)(\d\d)(\d\d)\s*")
+FBIS_DATE = re.compile(r"\s*(\d+) ([A-Za-z]+) (\d\d\d\d)\s*")
+
+PARAGRAPH_INDENT = re.compile(r"^   ", flags=re.MULTILINE)
+FBIS_PARAGRAPH_INDENT = re.compile(r"^  ", flags=re.MULTILINE)
+FBIS_FONT_TAG = re.compile(r"</?F.*?>")
+
+# Source parsers keyed by DOCNO prefix, which is also the prefix of the
+# document file names. See register_source.
+SOURCE_PARSERS = {}
+SOURCE_PATTERN = None
+
+def register_source(prefix, parser):
+    '''
+    Register parser for the documents whose DOCNO starts with prefix.
+    parser(xml) must return (doc_id, paragraphs, date) for the text of a
+    document file. If several prefixes match a document, the longest
+    wins.
+    '''
+    global SOURCE_PATTERN
+    SOURCE_PARSERS[prefix] = parser
+    prefixes = sorted(SOURCE_PARSERS, key=lambda p: (-len(p), p))
+    SOURCE_PATTERN = re.compile(
+        "|".join(re.escape(prefix) for prefix in prefixes))
+
+def get_source_parser(docno):
+    '''
+    Return the registered parser for a DOCNO or document file name.
+    '''
+    match = None
+    if SOURCE_PATTERN is not None:
+        match = SOURCE_PATTERN.match(docno)
+    if match is None:
+        raise Exception("No source parser for document {}".format(docno))
+    return SOURCE_PARSERS[match.group()]
+
+def parse_wsj(xml):
+
+    paragraphs = []
+    tags = scan_tags(xml)
+
+    docno_match = match_tag(xml, tags, "DOCNO", WSJ_DOCNO)
+    assert docno_match is not None
+
+    doc_id, year, month, day = docno_match.groups()
+    year = int("19" + year)
+    month = int(month)
+    day = int(day)
+    date = datetime.date(year, month, day)
+
+    lp_text = get_text(xml, tags, "LP")
+    if lp_text is not None:
+        for graf in PARAGRAPH_INDENT.split(lp_text):
+            paragraphs.append(graf)
+
+    body_text = get_text(xml, tags, "TEXT")
+    assert body_text is not None
+
+    for graf in PARAGRAPH_INDENT.split(body_text):
+        paragraphs.append(graf)
+
+    return doc_id, paragraphs, date
+
+def parse_fbis(xml):
+
+    paragraphs = []
+    tags = scan_tags(xml)
+
+    doc_id_match = match_tag(xml, tags, "DOCNO", FBIS_DOCNO)
+    assert doc_id_match is not None
+    doc_id = doc_id_match.groups()[0]
+
+    date_match = match_tag(xml, tags, "DATE1", FBIS_DATE)
+    assert date_match is not None
+
+    day, month, year = date_match.groups()
+    year = int(year)
+    
+    if month == "Jan":
+        month = 1
+    elif month == "January":
+        month = 1
+    elif month == "Mar":
+        month = 2
+    elif month == "March":
+        month = 2
+    elif month == "Feb":
+        month = 3
+    elif month == "February":
+        month = 3
+    elif month == "Apr":
+        month = 4
+    elif month == "May":
+        month = 5
+    elif month == "Jun":
+        month = 6
+    elif month == "Jul":
+        month = 7
+    elif month == "Aug":
+        month = 8
+    elif month == "Sep":
+        month = 9
+    elif month == "Oct":
+        month = 10
+    elif month == "Nov":
+        month = 11
+    elif month == "Dec":
+        month = 12
+    else:
+        raise Exception()
+
+    day = int(day)
+    date = datetime.date(year, month, day)
+
+    body_text = get_text(xml, tags, "TEXT")
+    assert body_text is not None
+    body_text = FBIS_FONT_TAG.sub(r" ", body_text) 
+
+    for graf in FBIS_PARAGRAPH_INDENT.split(body_text):
+        paragraphs.append(graf)
+
+    return doc_id, paragraphs, date
+
+def parse_la(xml):
+
+    paragraphs = []
+    tags = scan_tags(xml)
+
+    docno_match = match_tag(xml, tags, "DOCNO", LA_DOCNO)
+    assert docno_match is not None
+    doc_id, month, day, year = docno_match.groups()
+    year = int("19" + year)
+    month = int(month)
+    day = int(day)
+    date = datetime.date(year, month, day)
+
+    # <P> tags also occur outside of the body text, e.g. in <HEADLINE>.
+    paragraph_spans = get_spans(tags, "P")
+    for text_start, text_end, _ in get_spans(tags, "TEXT"):
+        for start, end, _ in paragraph_spans:
+            if start >= text_start and end <= text_end:
+                paragraphs.append(xml[start:end])
+ 
+    return doc_id, paragraphs, date
+
+def parse_ap(xml):
+
+    paragraphs = []
+    tags = scan_tags(xml)
+
+    docno_match = match_tag(xml, tags, "DOCNO", AP_DOCNO)
+    assert docno_match is not None
+
+    doc_id, year, month, day = docno_match.groups()
+    year = int("19" + year)
+    month = int(month)
+    day = int(day)
+    date = datetime.date(year, month, day)
+
+    body_texts = get_texts(xml, tags, "TEXT")
+    assert len(body_texts) > 0
+
+    for body_text in body_texts:
+        for graf in PARAGRAPH_INDENT.split(body_text):
+            paragraphs.append(graf)
+    
+    return doc_id, paragraphs, date
+
+def parse_ft(xml):
+
+    paragraphs = []
+    tags = scan_tags(xml)
+
+    doc_id_match = match_tag(xml, tags, "DOCNO", FT_DOCNO)
+    assert doc_id_match is not None
+    doc_id = doc_id_match.groups()[0]
+
+    date_match = match_tag(xml, tags, "DATE", YYMMDD_DATE)
+    assert date_match is not None
+
+    year, month, day = date_match.groups()
+    year = int("19" + year)
+    month = int(month)
+    day = int(day)
+    date = datetime.date(year, month, day)
+    body_text = get_text(xml, tags, "TEXT")
+    assert body_text is not None
+
+    paragraphs.append(body_text)
+            
+    return doc_id, paragraphs, date  
+
+def parse_sjmn(xml):
+
+    paragraphs = []
+    tags = scan_tags(xml)
+
+    doc_id_match = match_tag(xml, tags, "DOCNO", SJMN_DOCNO)
+    assert doc_id_match is not None
+    doc_id = doc_id_match.groups()[0]
+
+    pubdate_match = match_tag(xml, tags, "PUBDATE", YYMMDD_DATE)
+    assert pubdate_match is not None
+
+    year, month, day = pubdate_match.groups()
+    year = int("19" + year)
+    month = int(month)
+    day = int(day)
+    date = datetime.date(year, month, day)
+
+    lead_text = get_text(xml, tags, "LEADPARA")
+    assert lead_text is not None
+
+    for graf in lead_text.split(";"):
+        paragraphs.append(graf)
+
+    body_text = get_text(xml, tags, "TEXT")
+    assert body_text is not None
+
+    for graf in body_text.split(";"):
+        paragraphs.append(graf)
+            
+    return doc_id, paragraphs, date
+
+register_source("AP", parse_ap)
+register_source("WSJ", parse_wsj)
+register_source("FT", parse_ft)
+register_source("LA", parse_la)
+register_source("FBIS", parse_fbis)
+register_source("SJMN", parse_sjmn)
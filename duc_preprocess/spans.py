@@ -0,0 +1,90 @@
+# In the span representation, a document's or summary's normalized
+# paragraphs are joined by newlines into one "text" and each sentence
+# holds the character offsets of itself ("start", "end") and of its
+# tokens ("token_starts", "token_ends") in that text, along with any
+# pos and ne tags, instead of copies of its text and tokens. The text
+# of a sentence and its lower cased tokens are sliced out of the text
+# when they are needed; they are then the same as those of the copied
+# representation.
+# In output files, the token offsets of a sentence are stored as one
+# list of "token_spans" holding, for each token, the number of characters
+# between the end of the previous token (or the start of the sentence)
+# and its start, and its length. These are mostly single digits, so the
+# output is smaller than with copies of the tokens.
+
+def make_sentence(start, end, token_starts, token_ends):
+    return {"start": start, "end": end, "token_starts": token_starts,
+            "token_ends": token_ends}
+
+def shift_sentences(sentences, offset):
+    '''
+    Return span sentences with offsets into a paragraph moved to offsets
+    into a text in which the paragraph starts at offset.
+    '''
+    if offset == 0:
+        return sentences
+    shifted = []
+    for sentence in sentences:
+        sentence = dict(sentence)
+        sentence["start"] += offset
+        sentence["end"] += offset
+        sentence["token_starts"] = [
+            start + offset for start in sentence["token_starts"]]
+        sentence["token_ends"] = [
+            end + offset for end in sentence["token_ends"]]
+        shifted.append(sentence)
+    return shifted
+
+def encode_token_spans(sentence):
+    token_spans = []
+    previous = sentence["start"]
+    for start, end in zip(sentence["token_starts"], sentence["token_ends"]):
+        token_spans.append(start - previous)
+        token_spans.append(end - start)
+        previous = end
+    return token_spans
+
+def decode_token_spans(start, token_spans):
+    '''
+    Return the token starts and ends of the token_spans of a sentence
+    starting at start (see encode_token_spans).
+    '''
+    token_starts = []
+    token_ends = []
+    end = start
+    for i in range(0, len(token_spans), 2):
+        start = end + token_spans[i]
+        end = start + token_spans[i + 1]
+        token_starts.append(start)
+        token_ends.append(end)
+    return token_starts, token_ends
+
+def get_sentence_text(text, sentence):
+    return text[sentence["start"]:sentence["end"]]
+
+def get_sentence_tokens(text, sentence):
+    return [text[start:end].lower() for start, end in zip(
+        sentence["token_starts"], sentence["token_ends"])]
+
+def count_tokens(sentence):
+    '''
+    Return the number of tokens of a sentence in either representation.
+    '''
+    if "tokens" in sentence:
+        return len(sentence["tokens"])
+    return len(sentence["token_starts"])
+
+def expand_sentences(text, sentences):
+    '''
+    Return span sentences of text as sentences with copies of their text
+    and tokens, as the annotators produce without spans.
+    '''
+    expanded = []
+    for sentence in sentences:
+        record = {"tokens": get_sentence_tokens(text, sentence),
+                  "text": get_sentence_text(text, sentence)}
+        for field in ["pos", "ne"]:
+            if field in sentence:
+                record[field] = sentence[field]
+        expanded.append(record)
+    return expanded
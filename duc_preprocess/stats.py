@@ -0,0 +1,126 @@
+import contextlib
+import json
+import logging
+import threading
+import time
+from .spans import count_tokens
+
+
+# Stages of a build, in pipeline order:
+#   extract -- reading the release tarballs into memory
+#   load -- loading the annotator in this process
+#   read -- reading release files
+#   repair -- applying patches to release files as they are read
+#   parse -- reading documents and summaries out of their SGML
+#   annotate -- annotating paragraphs, summed over worker processes
+#   serialize -- turning annotated documents into output records
+#   write -- writing output files
+#   write_wait -- waiting for room in the queue of the writer threads,
+#                 when writing output is slower than building it
+#   align -- aligning input sentences with their summaries, if asked for
+STAGES = ["extract", "load", "read", "repair", "parse", "annotate",
+          "serialize", "write", "write_wait", "align"]
+# Counts of documents built and skipped as up to date, their summaries,
+# the paragraphs, sentences and tokens annotated (of documents and
+# summaries), release bytes read and output bytes written.
+COUNTERS = ["documents", "skipped_documents", "summaries", "paragraphs",
+            "sentences", "tokens", "bytes_read", "bytes_written"]
+
+# The stages being timed in each thread, innermost last, keyed by thread
+# id, so that a profiler sampling a thread can tell which stage it is in.
+ACTIVE_STAGES = {}
+# Guards the BuildStats updated by the writer threads (see
+# output.AsyncWriter) as well as the main thread. It is not an attribute
+# so that BuildStats can be sent between processes.
+STATS_LOCK = threading.Lock()
+
+def get_active_stage(thread_id):
+    '''
+    Return the innermost stage being timed in thread thread_id, or None.
+    '''
+    stages = ACTIVE_STAGES.get(thread_id)
+    if not stages:
+        return None
+    return stages[-1]
+
+class BuildStats(object):
+    '''
+    Wall time per build stage (see STAGES) and counts of what was read,
+    annotated and written (see COUNTERS). elapsed is the wall time of the
+    whole build once stop is called.
+    Annotation runs in the worker processes when there are several, and
+    serializing and writing in writer threads, so the stage times can add
+    up to more than elapsed.
+    '''
+
+    def __init__(self):
+        self.seconds = {stage: 0.0 for stage in STAGES}
+        self.counts = {counter: 0 for counter in COUNTERS}
+        self.start_time = time.time()
+        self.elapsed = None
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        stages = ACTIVE_STAGES.setdefault(threading.get_ident(), [])
+        stages.append(stage)
+        start = time.time()
+        try:
+            yield
+        finally:
+            with STATS_LOCK:
+                self.seconds[stage] += time.time() - start
+            stages.pop()
+
+    def count(self, counter, n=1):
+        with STATS_LOCK:
+            self.counts[counter] += n
+
+    def count_sentences(self, sentences):
+        tokens = sum(count_tokens(sentence) for sentence in sentences)
+        with STATS_LOCK:
+            self.counts["sentences"] += len(sentences)
+            self.counts["tokens"] += tokens
+
+    def merge(self, other):
+        with STATS_LOCK:
+            for stage, seconds in other.seconds.items():
+                self.seconds[stage] += seconds
+            for counter, n in other.counts.items():
+                self.counts[counter] += n
+
+    def stop(self):
+        self.elapsed = time.time() - self.start_time
+        return self
+
+    def to_dict(self):
+        return {"elapsed": self.elapsed,
+                "seconds": dict(self.seconds),
+                "counts": dict(self.counts)}
+
+    def save(self, path):
+        with open(path, "w") as fp:
+            fp.write(json.dumps(self.to_dict(), indent=2, sort_keys=True))
+
+    def format(self):
+        lines = []
+        if self.elapsed is not None:
+            lines.append("Elapsed: {:.2f}s".format(self.elapsed))
+        lines.append("Stages: " + ", ".join(
+            "{} {:.2f}s".format(stage, self.seconds[stage])
+            for stage in STAGES))
+        lines.append("Counts: " + ", ".join(
+            "{} {}".format(counter, self.counts[counter])
+            for counter in COUNTERS))
+        return "\n".join(lines)
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+def configure_logging(level="INFO"):
+    '''
+    Send the package's log messages at level and above to stderr, for
+    the command line entry points. Per file messages are logged at
+    DEBUG.
+    '''
+    logging.basicConfig(
+        level=getattr(logging, level),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
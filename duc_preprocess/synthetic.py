@@ -0,0 +1,383 @@
+import argparse
+import io
+import itertools
+import logging
+import os
+import random
+import tarfile
+from .stats import configure_logging, LOG_LEVELS
+
+
+# The release tarballs written by make_duc2001_release and
+# make_duc2002_release have the layout, file names and SGML of the NIST
+# releases, so preprocess_sds reads them like the real data, but the
+# text is random words. They are meant for benchmarking and testing
+# without the licensed data.
+
+DUC2001_ROOT = "DUC2001_Summarization_Documents"
+DUC2002_DOCUMENT_ROOT = "DUC2002_Summarization_Documents"
+DUC2002_SUMMARY_ROOT = "DUC2002_test_data"
+
+SOURCES = ["AP", "WSJ", "FT", "LA", "FBIS", "SJMN"]
+FBIS_MONTHS = [
+    "January", "February", "March", "Jan", "Feb", "Mar", "Apr", "May",
+    "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+MDS_SIZES = {"duc2001": ["50", "100", "200", "400"],
+             "duc2002": ["10", "50", "100", "200"]}
+DOCSET_LETTERS = "abcdefghijk"
+
+DEFAULT_DOCS_PER_DOCSET = 10
+DEFAULT_DUC2002_DOCSETS = 59
+# The fraction of the documents of each DUC 2002 docset that are copies,
+# with the same DOCNO and SGML, of DUC 2001 documents, as the releases
+# draw on the same TREC sources (see dedup.SharedDocuments).
+DEFAULT_DUC2002_OVERLAP = .1
+DEFAULT_VOCAB_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+FUNCTION_WORDS = (
+    "the of and to in a is that for it as was with be by on not he this "
+    "are or his from at which but have an they you were her she there had "
+    "said would been their has will who more its after when new about "
+    "than one two three").split()
+SYLLABLES = (
+    "ka ro mi ten sa lo ver an dis pel mar ton ex ri co fa nu tra por "
+    "gen ad li be ste cal men ho sun der").split()
+
+class TextGenerator(object):
+    '''
+    Random English like text. Content words are drawn from a vocabulary
+    of vocab_size made up words with a Zipf like distribution, so the
+    vocabulary grows with the corpus roughly as it does for news text.
+    '''
+
+    def __init__(self, rng, vocab_size=DEFAULT_VOCAB_SIZE):
+        self.rng = rng
+        words = set()
+        while len(words) < vocab_size:
+            words.add("".join(
+                rng.choice(SYLLABLES) for i in range(rng.randint(1, 4))))
+        self.words = sorted(words)
+        rng.shuffle(self.words)
+        self.cum_weights = list(itertools.accumulate(
+            1.0 / rank for rank in range(1, vocab_size + 1)))
+
+    def word(self):
+        rng = self.rng
+        if rng.random() < .4:
+            return rng.choice(FUNCTION_WORDS)
+        return rng.choices(self.words, cum_weights=self.cum_weights)[0]
+
+    def sentence(self, min_words=8, max_words=30):
+        rng = self.rng
+        words = [self.word()
+                 for i in range(rng.randint(min_words, max_words))]
+        for i in range(len(words)):
+            if rng.random() < .08:
+                words[i] = words[i].capitalize()
+        words[0] = words[0].capitalize()
+        if rng.random() < .3:
+            words[rng.randrange(len(words) - 1)] += ","
+        if rng.random() < .1:
+            words.insert(rng.randrange(len(words)), str(rng.randint(2, 999)))
+        return " ".join(words) + rng.choice([".", ".", ".", ".", "?", "!"])
+
+    def paragraph(self, min_sentences=1, max_sentences=3):
+        return " ".join(
+            self.sentence()
+            for i in range(self.rng.randint(min_sentences, max_sentences)))
+
+    def paragraphs(self, min_paragraphs=8, max_paragraphs=25):
+        return [self.paragraph() for i in range(
+            self.rng.randint(min_paragraphs, max_paragraphs))]
+
+class DocnoGenerator(object):
+    '''
+    Makes unique DOCNOs, and matching dates, for each source, none of
+    them in taken.
+    '''
+
+    def __init__(self, rng, taken=()):
+        self.rng = rng
+        self.count = 0
+        self.taken = set(taken)
+
+    def make(self, source):
+        while True:
+            docno, date = self.make_any(source)
+            if docno not in self.taken:
+                return docno, date
+
+    def make_any(self, source):
+        rng = self.rng
+        self.count += 1
+        year = rng.randint(88, 91)
+        month = rng.randint(1, 12)
+        day = rng.randint(1, 28)
+        date = "{:02d}{:02d}{:02d}".format(year, month, day)
+        if source == "AP":
+            docno = "AP{}-{:04d}".format(date, self.count)
+        elif source == "WSJ":
+            docno = "WSJ{}-{:04d}".format(date, self.count)
+        elif source == "LA":
+            docno = "LA{:02d}{:02d}{:02d}-{:04d}".format(
+                month, day, year, self.count)
+        elif source == "FT":
+            docno = "FT9{}{}-{}".format(
+                year % 10, rng.randint(1, 4), self.count)
+        elif source == "FBIS":
+            docno = "FBIS{}-{}".format(rng.randint(3, 4), self.count)
+        else:
+            docno = "SJMN{}-{:08d}".format(year, self.count)
+        return docno, date
+
+def make_document(source, docno, date, text):
+    '''
+    Return the SGML of a document in the format of source.
+    '''
+    rng = text.rng
+    paragraphs = text.paragraphs()
+    if source == "AP":
+        return (
+            "<DOC>\n<DOCNO> {} </DOCNO>\n<FILEID>AP-NR-{}</FILEID>\n"
+            "<HEAD>{}</HEAD>\n<TEXT>\n{}\n</TEXT>\n</DOC>\n").format(
+                docno, date, text.sentence(),
+                "\n".join("   " + p for p in paragraphs))
+    elif source == "WSJ":
+        return (
+            "<DOC>\n<DOCNO> {} </DOCNO>\n<DD> {} </DD>\n<HL> {} </HL>\n"
+            "<LP>\n{}\n</LP>\n<TEXT>\n{}\n</TEXT>\n</DOC>\n").format(
+                docno, date, text.sentence(),
+                "\n".join("   " + p for p in paragraphs[:2]),
+                "\n".join("   " + p for p in paragraphs[2:]))
+    elif source == "FT":
+        return (
+            "<DOC>\n<DOCNO>{}</DOCNO>\n<PROFILE>_AN-{}</PROFILE>\n"
+            "<DATE>{}\n</DATE>\n<HEADLINE>\n{}\n</HEADLINE>\n"
+            "<TEXT>\n{}\n</TEXT>\n</DOC>\n").format(
+                docno, docno, date, text.sentence(), "\n".join(paragraphs))
+    elif source == "LA":
+        return (
+            "<DOC>\n<DOCNO> {} </DOCNO>\n<DOCID> {} </DOCID>\n"
+            "<DATE>\n<P>\n{}\n</P>\n</DATE>\n<HEADLINE>\n<P>\n{}\n</P>\n"
+            "</HEADLINE>\n<TEXT>\n{}\n</TEXT>\n</DOC>\n").format(
+                docno, rng.randint(1, 99999), date, text.sentence(),
+                "\n".join("<P>\n{}\n</P>".format(p) for p in paragraphs))
+    elif source == "FBIS":
+        return (
+            "<DOC>\n<DOCNO> {} </DOCNO>\n<HT>  \"{}\" </HT>\n<HEADER>\n"
+            "<DATE1>  {} {} 19{} </DATE1>\n</HEADER>\n<TEXT>\n"
+            "Language: <F P=105> English </F>\n{}\n</TEXT>\n</DOC>\n").format(
+                docno, docno.lower(), int(date[4:]),
+                rng.choice(FBIS_MONTHS), date[:2],
+                "\n".join("  " + p for p in paragraphs))
+    elif source == "SJMN":
+        return (
+            "<DOC>\n<DOCNO> {} </DOCNO>\n<ACCESS> {} </ACCESS>\n"
+            "<PUBDATE> {} </PUBDATE>\n<LEADPARA>\n{}\n</LEADPARA>\n"
+            "<TEXT>\n{}\n</TEXT>\n</DOC>\n").format(
+                docno, rng.randint(1, 99999999), date,
+                "; ".join(paragraphs[:2]), "; ".join(paragraphs[2:]))
+    raise Exception("Unknown source: {}".format(source))
+
+def make_perdocs(docnos, selector, text):
+    '''
+    Return a perdocs file with a roughly 100 word summary of each docno.
+    '''
+    summaries = []
+    for docno in docnos:
+        summaries.append(
+            '<SUM\nTYPE="PERDOC"\nSIZE="100"\nDOCREF="{}"\nSELECTOR="{}"\n'
+            'SUMMARIZER="{}">\n{}\n</SUM>\n'.format(
+                docno, selector, selector, text.paragraph(4, 6)))
+    return "".join(summaries)
+
+def make_multi(docnos, size, selector, text):
+    '''
+    Return a multi document summary file of about size words.
+    '''
+    sentences = max(1, int(size) // 20)
+    return (
+        '<SUM\nTYPE="MULTI"\nSIZE="{}"\nDOCREF="{}"\nSELECTOR="{}"\n'
+        'SUMMARIZER="{}">\n{}\n</SUM>\n').format(
+            size, "\n".join(docnos), selector, selector,
+            text.paragraph(sentences, sentences))
+
+def make_docset(text, docnos, docs_per_docset):
+    '''
+    Return a list of (docno, sgml) for a new docset.
+    '''
+    documents = []
+    for i in range(docs_per_docset):
+        source = text.rng.choice(SOURCES)
+        docno, date = docnos.make(source)
+        documents.append((docno, make_document(source, docno, date, text)))
+    return documents
+
+def add_file(tar, name, text):
+    data = text.encode("utf-8")
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+def get_docset_ids(count, first=1, digits=2):
+    return ["d{}{}".format(
+                str(i).zfill(digits), DOCSET_LETTERS[i % len(DOCSET_LETTERS)])
+            for i in range(first, first + count)]
+
+def make_duc2001_release(path, docs_per_docset=DEFAULT_DOCS_PER_DOCSET,
+                         seed=0, vocab_size=DEFAULT_VOCAB_SIZE):
+    '''
+    Write a synthetic DUC2001_Summarization_Documents.tgz to path with
+    30 training and 30 test docsets of docs_per_docset documents each.
+    Every document has a perdocs summary; each test docset also has
+    duplicate summaries of half its documents.
+    Returns the list of (docno, sgml) of all the documents.
+    '''
+    rng = random.Random(seed)
+    text = TextGenerator(rng, vocab_size=vocab_size)
+    docnos = DocnoGenerator(rng)
+    docset_ids = get_docset_ids(60)
+    root = DUC2001_ROOT + "/data"
+    all_documents = []
+    logger.info("Writing %s ...", path)
+    with tarfile.open(path, "w:gz") as tar:
+        for docset_id in docset_ids[:30]:
+            documents = make_docset(text, docnos, docs_per_docset)
+            all_documents.extend(documents)
+            docset_dir = "{}/training/{}".format(root, docset_id)
+            for docno, sgml in documents:
+                add_file(tar, "{}/docs/{}".format(docset_dir, docno), sgml)
+            summary_dir = "{}/{}{}".format(
+                docset_dir, docset_id, docset_id[-1])
+            ids = [docno for docno, _ in documents]
+            add_file(tar, summary_dir + "/perdocs",
+                     make_perdocs(ids, "A", text))
+            for size in MDS_SIZES["duc2001"]:
+                add_file(tar, "{}/{}".format(summary_dir, size),
+                         make_multi(ids, size, "A", text))
+
+        for docset_id in docset_ids[30:]:
+            documents = make_docset(text, docnos, docs_per_docset)
+            all_documents.extend(documents)
+            for docno, sgml in documents:
+                add_file(tar, "{}/test/docs/{}/{}".format(
+                    root, docset_id, docno), sgml)
+            ids = [docno for docno, _ in documents]
+            for summaries, selector, summarized in [
+                    ("original.summaries", docset_id[-1], ids),
+                    ("duplicate.summaries", "z", ids[:len(ids) // 2])]:
+                summary_dir = "{}/test/{}/{}{}".format(
+                    root, summaries, docset_id, selector)
+                add_file(tar, summary_dir + "/perdocs",
+                         make_perdocs(summarized, selector.upper(), text))
+                for size in MDS_SIZES["duc2001"]:
+                    add_file(tar, "{}/{}".format(summary_dir, size),
+                             make_multi(ids, size, selector.upper(), text))
+    return all_documents
+
+def make_duc2002_release(document_path, summary_path,
+                         docsets=DEFAULT_DUC2002_DOCSETS,
+                         docs_per_docset=DEFAULT_DOCS_PER_DOCSET, seed=0,
+                         vocab_size=DEFAULT_VOCAB_SIZE,
+                         shared_documents=(), overlap=0.):
+    '''
+    Write a synthetic DUC2002_Summarization_Documents.tgz, holding the
+    documents in a nested duc2002testdocs.tar, to document_path and a
+    DUC2002_test_data.tar.gz with two perdocs summaries of every document
+    to summary_path.
+    The fraction overlap of the documents of each docset, as long as
+    there are any left, are drawn at random from shared_documents, a list
+    of (docno, sgml) e.g. of the DUC 2001 release, instead of generated.
+    '''
+    rng = random.Random(seed)
+    text = TextGenerator(rng, vocab_size=vocab_size)
+    docnos = DocnoGenerator(
+        rng, taken=[docno for docno, _ in shared_documents])
+    # Drawn with their own generator so that the generated documents are
+    # the same whatever the overlap.
+    shared_documents = random.Random(seed).sample(
+        list(shared_documents), len(shared_documents))
+    shared_per_docset = int(round(overlap * docs_per_docset))
+    inner = io.BytesIO()
+    logger.info("Writing %s ...", summary_path)
+    with tarfile.open(summary_path, "w:gz") as summary_tar:
+        with tarfile.open(fileobj=inner, mode="w") as document_tar:
+            for docset_id in get_docset_ids(docsets, first=61, digits=3):
+                shared = shared_documents[:shared_per_docset]
+                del shared_documents[:shared_per_docset]
+                documents = make_docset(
+                    text, docnos, docs_per_docset - len(shared)) + shared
+                for docno, sgml in documents:
+                    add_file(document_tar, "docs/{}/{}".format(
+                        docset_id, docno), sgml)
+                ids = [docno for docno, _ in documents]
+                for selector in "ab":
+                    summary_dir = "{}/summaries/summaries/{}{}".format(
+                        DUC2002_SUMMARY_ROOT, docset_id, selector)
+                    add_file(summary_tar, summary_dir + "/perdocs",
+                             make_perdocs(ids, selector.upper(), text))
+                    for size in MDS_SIZES["duc2002"]:
+                        add_file(summary_tar, "{}/{}".format(
+                            summary_dir, size), make_multi(
+                                ids, size, selector.upper(), text))
+
+    logger.info("Writing %s ...", document_path)
+    with tarfile.open(document_path, "w:gz") as tar:
+        data = inner.getvalue()
+        info = tarfile.TarInfo(DUC2002_DOCUMENT_ROOT + "/duc2002testdocs.tar")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+def make_releases(output_dir, docs_per_docset=DEFAULT_DOCS_PER_DOCSET,
+                  duc2002_docsets=DEFAULT_DUC2002_DOCSETS, seed=0,
+                  vocab_size=DEFAULT_VOCAB_SIZE,
+                  duc2002_overlap=DEFAULT_DUC2002_OVERLAP):
+    '''
+    Write synthetic DUC 2001 and DUC 2002 release tarballs to output_dir
+    under their NIST file names and return a dict of their paths, keyed
+    like the preprocess_sds arguments. The fraction duc2002_overlap of
+    the documents of each DUC 2002 docset are DUC 2001 documents.
+    '''
+    if output_dir != "" and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    paths = {
+        "duc2001": os.path.join(
+            output_dir, "DUC2001_Summarization_Documents.tgz"),
+        "duc2002_documents": os.path.join(
+            output_dir, "DUC2002_Summarization_Documents.tgz"),
+        "duc2002_summaries": os.path.join(
+            output_dir, "DUC2002_test_data.tar.gz")}
+    duc2001_documents = make_duc2001_release(
+        paths["duc2001"], docs_per_docset=docs_per_docset, seed=seed,
+        vocab_size=vocab_size)
+    make_duc2002_release(
+        paths["duc2002_documents"], paths["duc2002_summaries"],
+        docsets=duc2002_docsets, docs_per_docset=docs_per_docset,
+        seed=seed + 1, vocab_size=vocab_size,
+        shared_documents=duc2001_documents, overlap=duc2002_overlap)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output-path", type=str, required=True)
+    parser.add_argument(
+        "--docs-per-docset", type=int, default=DEFAULT_DOCS_PER_DOCSET)
+    parser.add_argument(
+        "--duc2002-docsets", type=int, default=DEFAULT_DUC2002_DOCSETS)
+    parser.add_argument("--vocab-size", type=int, default=DEFAULT_VOCAB_SIZE)
+    parser.add_argument(
+        "--duc2002-overlap", type=float, default=DEFAULT_DUC2002_OVERLAP)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", choices=LOG_LEVELS, default="INFO")
+    args = parser.parse_args()
+    configure_logging(args.log_level)
+
+    make_releases(
+        args.output_path, docs_per_docset=args.docs_per_docset,
+        duc2002_docsets=args.duc2002_docsets, seed=args.seed,
+        vocab_size=args.vocab_size, duc2002_overlap=args.duc2002_overlap)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import re
+
+
+# Bump when a change here changes the tokens or sentences produced, so
+# that cached annotations are not reused.
+TOKENIZER_VERSION = "2"
+
+ABBREVIATIONS = [
+    "Mr", "Mrs", "Ms", "Dr", "St", "Jr", "Sr", "Co", "Corp", "Inc", "Ltd",
+    "Bros", "Gov", "Sen", "Rep", "Gen", "Col", "Lt", "Sgt", "Capt", "Prof",
+    "Rev", "Jan", "Feb", "Mar", "Apr", "Aug", "Sep", "Sept", "Oct", "Nov",
+    "Dec", "vs", "No", "Nos", "Mt", "Ft", "Ave", "Blvd"]
+
+CLITICS = r"(?:s|S|m|M|d|D|ll|LL|re|RE|ve|VE)\b"
+
+# Roughly follows spacy's English tokenizer: abbreviations and numbers
+# are kept whole, "n't" and clitics like "'s" are split off, and every
+# other punctuation character is its own token. The pattern is case
+# sensitive, since re.IGNORECASE makes it about twice as slow.
+TOKEN_PATTERN = re.compile(
+    r"(?:[A-Za-z]\.){2,}(?![A-Za-z])"
+    r"|(?:" + "|".join(ABBREVIATIONS) + r")\.(?!\w)"
+    r"|\d+(?:[.,:/]\d+)*"
+    r"|\w+(?=[nN]'[tT]\b)|[nN]'[tT]\b"
+    r"|'" + CLITICS +
+    r"|\w+(?:[-&]\w+)*(?:'(?!" + CLITICS + r")\w+)*"
+    r"|\.\.\.+|--+|``|''"
+    r"|\S")
+
+SENTENCE_ENDS = set([".", "!", "?", "...", "...."])
+CLOSING_PUNCTUATION = set(["\"", "'", "''", ")", "]", "}"])
+
+def tokenize(text):
+    '''
+    Return the (start, end) character spans of the tokens of text.
+    '''
+    return [match.span() for match in TOKEN_PATTERN.finditer(text)]
+
+def split_sentences(text, spans=None):
+    '''
+    Group the token spans of text into sentences, returned as lists of
+    spans. A sentence ends after ".", "!", "?" or an ellipsis, and any
+    closing quotes or brackets directly after it, unless the next token
+    starts with a lower case letter.
+    '''
+    if spans is None:
+        spans = tokenize(text)
+    sentences = []
+    sentence = []
+    ended = False
+    previous_end = None
+    for start, end in spans:
+        token = text[start:end]
+        closing = token in CLOSING_PUNCTUATION and start == previous_end
+        if ended and not closing:
+            if not token[0].islower():
+                sentences.append(sentence)
+                sentence = []
+            ended = False
+        sentence.append((start, end))
+        previous_end = end
+        if token in SENTENCE_ENDS:
+            ended = True
+    if len(sentence) > 0:
+        sentences.append(sentence)
+    return sentences
@@ -0,0 +1,70 @@
+import os
+import json
+import collections
+from .arrays import TAG_FIELDS, STREAMS
+
+
+def validate_directory(path):
+    if path != "" and not os.path.exists(path):
+        os.makedirs(path)
+
+class VocabCounts(object):
+    '''
+    Frequencies of the tokens, pos tags and ne tags (those of fields) of
+    the input documents and target summaries of a build, and the
+    document frequency of each token: the number of input documents, or
+    of summaries, it occurs in. Tokens are lower cased when they are
+    annotated, so there are no separate lower case counts.
+    Counts are kept per docset in the workers and merged, so no second
+    pass over the output is needed.
+    '''
+
+    def __init__(self, fields=TAG_FIELDS):
+        self.fields = list(fields)
+        self.tables = self.fields + ["document_frequency"]
+        self.counts = {(stream, table): collections.Counter()
+                       for stream in STREAMS for table in self.tables}
+
+    def add(self, stream, sentences):
+        '''
+        Count the sentences of one document (or summary) of stream,
+        "inputs" or "targets".
+        '''
+        for field in self.fields:
+            counts = self.counts[(stream, field)]
+            for sentence in sentences:
+                counts.update(sentence[field])
+        self.counts[(stream, "document_frequency")].update(set(
+            token for sentence in sentences for token in sentence["tokens"]))
+
+    def merge(self, other):
+        for key, counts in other.counts.items():
+            self.counts[key].update(counts)
+
+    def save(self, directory):
+        '''
+        Write each table of each stream to directory/{stream}.{table}.jsonl,
+        one JSON [word, count] pair per line, most frequent first.
+        '''
+        validate_directory(directory)
+        for (stream, table), counts in self.counts.items():
+            path = os.path.join(
+                directory, "{}.{}.jsonl".format(stream, table))
+            with open(path, "w") as fp:
+                for word, count in sorted(
+                        counts.items(), key=lambda item: (-item[1], item[0])):
+                    fp.write(json.dumps([word, count]) + "\n")
+
+    @staticmethod
+    def load(directory):
+        fields = [field for field in TAG_FIELDS if os.path.exists(
+            os.path.join(directory, "inputs.{}.jsonl".format(field)))]
+        vocab = VocabCounts(fields)
+        for (stream, table), counts in vocab.counts.items():
+            path = os.path.join(
+                directory, "{}.{}.jsonl".format(stream, table))
+            with open(path, "r") as fp:
+                for line in fp:
+                    word, count = json.loads(line)
+                    counts[word] = count
+        return vocab
@@ -0,0 +1,147 @@
+import collections
+import multiprocessing
+from .annotation import load_annotator
+from .cache import AnnotationCache, DEFAULT_MAX_SIZE
+from .stats import BuildStats
+
+
+_worker_annotator = None
+_worker_cache = None
+
+def open_cache(cache_path, cache_max_size):
+    if cache_path is None:
+        return None
+    return AnnotationCache(cache_path, max_size=cache_max_size)
+
+def get_cache_counts(cache):
+    if cache is None:
+        return (0, 0, 0)
+    return (cache.hits, cache.misses, cache.evictions)
+
+def initialize_worker(load_annotator, cache_path, cache_max_size):
+    global _worker_annotator, _worker_cache
+    _worker_annotator = load_annotator()
+    _worker_cache = open_cache(cache_path, cache_max_size)
+
+def get_worker_model_id():
+    return _worker_annotator.model_id
+
+def run_job(job):
+    func, args, kwargs = job
+    counts = get_cache_counts(_worker_cache)
+    result = func(
+        *args, annotator=_worker_annotator, cache=_worker_cache, **kwargs)
+    new_counts = get_cache_counts(_worker_cache)
+    return result, [new - old for new, old in zip(new_counts, counts)]
+
+class DocsetPool(object):
+    '''
+    Runs per docset jobs either in this process or across a pool of
+    worker processes. Each worker calls load_annotator once when it
+    starts.
+    Results are always returned in job order so that output written from
+    them is identical to a serial run.
+    If workers is 1, jobs run in this process with annotator (loaded
+    with load_annotator on first use if annotator is None).
+    If cache_path is given, every process opens the AnnotationCache there
+    and self.cache counts the hits and misses of all of them.
+    Loading the annotator in this process is timed in stats.
+    '''
+
+    def __init__(self, workers=1, annotator=None,
+                 load_annotator=load_annotator,
+                 cache_path=None, cache_max_size=DEFAULT_MAX_SIZE,
+                 stats=None):
+        self.workers = workers
+        self.stats = stats if stats is not None else BuildStats()
+        self.annotator = annotator
+        self.load_annotator = load_annotator
+        self.cache = open_cache(cache_path, cache_max_size)
+        self.pool = None
+        if workers > 1:
+            self.pool = multiprocessing.Pool(
+                workers, initializer=initialize_worker,
+                initargs=(load_annotator, cache_path, cache_max_size))
+
+    def map(self, func, jobs, **kwargs):
+        '''
+        Call func(*args, annotator=annotator, cache=cache, **kwargs) for
+        each args tuple in jobs and return the list of results. func must
+        be a module level function so it can be sent to the worker
+        processes.
+        '''
+        return list(self.imap(func, jobs, **kwargs))
+
+    def imap(self, func, jobs, window=None, **kwargs):
+        '''
+        Like map but jobs may be a generator and results are yielded in
+        job order as they finish. At most window jobs (default twice the
+        number of workers) are read from jobs ahead of the result being
+        yielded, so memory use does not grow with the number of jobs.
+        '''
+        if self.pool is None:
+            annotator = self.get_annotator()
+            for args in jobs:
+                yield func(*args, annotator=annotator, cache=self.cache,
+                           **kwargs)
+            return
+
+        if window is None:
+            window = 2 * self.workers
+        pending = collections.deque()
+        for args in jobs:
+            pending.append(self.pool.apply_async(
+                run_job, ((func, args, kwargs),)))
+            if len(pending) >= window:
+                yield self.collect(pending.popleft().get())
+        while len(pending) > 0:
+            yield self.collect(pending.popleft().get())
+
+    def get_annotator(self):
+        if self.annotator is None:
+            with self.stats.timer("load"):
+                self.annotator = self.load_annotator()
+        return self.annotator
+
+    def get_model_id(self):
+        '''
+        Return the model_id of the annotator the jobs run with, which
+        names the model it loaded and keys its annotations in the cache
+        (see annotation.annotate_texts).
+        '''
+        if self.pool is not None:
+            return self.pool.apply(get_worker_model_id)
+        return self.get_annotator().model_id
+
+    def collect(self, job_result):
+        result, counts = job_result
+        if self.cache is not None:
+            self.cache.hits += counts[0]
+            self.cache.misses += counts[1]
+            self.cache.evictions += counts[2]
+        return result
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def terminate(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
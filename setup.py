@@ -14,4 +14,7 @@ setup(
        'git+https://github.com/kedz/rouge_papier.git#egg=rouge_papier'],
    install_requires = [
        "rouge_papier", "spacy==2.0.11"],
+   extras_require = {
+       "arrays": ["numpy"],
+       "zstd": ["zstandard"]},
 )